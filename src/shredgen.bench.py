@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+
+"""Benchmarks shredgen's riff generation, rendering, scale lookup & display paths across a range of input sizes.  The
+results are written as JSON so that two runs can be compared with --compare."""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+import shredgen
+
+_LENGTHS = [16, 10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7]
+_DEFAULT_MIN_TIME = 0.2
+_IMPORT_TIME_BUDGET_US = 15000  # cumulative time that importing shredgen may take according to python -X importtime
+_IMPORT_TIME_RUNS = 5
+
+
+def main():
+    opts = _parse_opts()
+    results = _run_benchmarks(int(opts.max_length), float(opts.min_time))
+    output = json.dumps(results, indent=2, sort_keys=True)
+
+    if opts.output:
+        with open(opts.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if opts.compare:
+        with open(opts.compare) as f:
+            _print_comparison(json.load(f), results)
+
+    if not _check_import_time():
+        sys.exit(1)
+
+
+def _parse_opts():
+    parser = argparse.ArgumentParser(description='Benchmark shredgen')
+
+    parser.add_argument('--compare', default=None, dest='compare',
+                        help='JSON results of an earlier run to compare this run against')
+    parser.add_argument('--max-length', default=_LENGTHS[-1], dest='max_length',
+                        help='Longest riff to benchmark (default: %(default)s)')
+    parser.add_argument('--min-time', default=_DEFAULT_MIN_TIME, dest='min_time',
+                        help='Minimum number of seconds to spend on each benchmark (default: %(default)s)')
+    parser.add_argument('--output', '-o', default=None, dest='output',
+                        help='File to write the JSON results to (default: stdout)')
+
+    return parser.parse_args()
+
+
+def _run_benchmarks(max_length, min_time):
+    scale = shredgen._get_scale_by_name('C Maj Pen')
+    lengths = [length for length in _LENGTHS if length <= max_length]
+    benchmarks = []
+    weighted = shredgen.RiffOptions(model='weighted')
+    markov = shredgen.RiffOptions(model='markov')
+    jump_1 = shredgen.RiffOptions(max_fret_jump=1)
+
+    for length in lengths:
+        riff = shredgen._generate_riff(scale, length, random.Random(length))
+        benchmarks.extend([
+            ('_generate_riff', length, lambda n=length: shredgen._generate_riff(scale, n, random.Random(n))),
+            ('_generate_riff --model weighted', length,
+             lambda n=length: shredgen._generate_riff(scale, n, random.Random(n), weighted)),
+            ('_generate_riff --model markov', length,
+             lambda n=length: shredgen._generate_riff(scale, n, random.Random(n), markov)),
+            ('_generate_riff --max-fret-jump 1', length,
+             lambda n=length: shredgen._generate_riff(scale, n, random.Random(n), jump_1)),
+            ('_generate_riff --rng counter', length,
+             lambda n=length: shredgen._generate_riff(scale, n, shredgen.CounterRandom(n))),
+            ('_shred_in_scale', length, lambda n=length: _without_stdout(shredgen._shred_in_scale, scale, n)),
+            ('ASCIITab.__str__', length, lambda r=riff: str(shredgen.ASCIITab(r))),
+        ])
+
+    tab = str(shredgen.ASCIITab(scale.notes))
+
+    benchmarks.extend([
+        ('_get_scale_by_name', 1, lambda: shredgen._get_scale_by_name('c maj pen')),
+        ('_get_tuned_scale', 1, lambda: shredgen._get_tuned_scale(scale, 'F#')),
+        ('ScaleRegistry', 1, lambda: shredgen.ScaleRegistry(shredgen._get_scale_families())),
+        ('ScaleRegistry.get_scale_by_name (uncached)', 1,
+         lambda: shredgen.ScaleRegistry(shredgen._get_scale_families()).get_scale_by_name('Bb Harm Min')),
+        ('_join_multiline_strings', len(tab), lambda: shredgen._join_multiline_strings(tab, tab)),
+        ('--all-scales --tuning', 1, lambda: _without_stdout(_display_all_scales_uncached, 'F#')),
+        ('--all-scales --tuning (cached)', 1, lambda: _without_stdout(_display_all_scales_cached, 'F#')),
+    ])
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        with patch.dict(os.environ, {'XDG_CACHE_HOME': cache_dir}):
+            # Fill the cache first, so that the cached benchmark's first call does not time rendering & writing it
+            _without_stdout(_display_all_scales_cached, 'F#')
+
+            return {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'results': [_run_benchmark(name, size, func, min_time) for name, size, func in benchmarks]
+            }
+
+
+def _check_import_time():
+    """Returns whether the fastest of a few imports of shredgen is within the import time budget.  Skipped, returning
+    True, before Python 3.7, which added python -X importtime."""
+    if sys.version_info < (3, 7):
+        print('Skipping the import time check, which needs Python 3.7 or later', file=sys.stderr)
+        return True
+
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    import_times = []
+
+    for _ in range(_IMPORT_TIME_RUNS):
+        output = subprocess.check_output(
+            [sys.executable, '-X', 'importtime', '-c', 'import shredgen'],
+            cwd=os.path.dirname(os.path.abspath(shredgen.__file__)),
+            env=env,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True
+        )
+        line = next(line for line in output.splitlines() if line.endswith('| shredgen'))
+        import_times.append(int(line.split('|')[1]))
+
+    import_time = min(import_times)
+    print('import shredgen: {}us (budget: {}us)'.format(import_time, _IMPORT_TIME_BUDGET_US), file=sys.stderr)
+
+    return import_time <= _IMPORT_TIME_BUDGET_US
+
+
+def _run_benchmark(name, size, func, min_time):
+    """Calls the function repeatedly for at least min_time seconds, returning the fastest & mean time per call."""
+    times = []
+    start = time.perf_counter()
+
+    while not times or time.perf_counter() - start < min_time:
+        call_start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - call_start)
+
+    print('{} ({}): {:.9f}s'.format(name, size, min(times)), file=sys.stderr)
+
+    return {
+        'name': name,
+        'size': size,
+        'calls': len(times),
+        'best_seconds': min(times),
+        'mean_seconds': sum(times) / len(times),
+    }
+
+
+def _display_all_scales_uncached(tuning):
+    with patch.object(shredgen, '_print_cached', lambda key, render: print(render())):
+        shredgen._display_all_scales_with_tuning(_opts(tuning))
+
+
+def _display_all_scales_cached(tuning):
+    shredgen._display_all_scales_with_tuning(_opts(tuning))
+
+
+def _opts(tuning):
+    return argparse.Namespace(tuning=tuning)
+
+
+def _without_stdout(func, *args):
+    with patch.object(sys, 'stdout', io.StringIO()):
+        func(*args)
+
+
+def _print_comparison(old_results, new_results):
+    old_times = dict(((r['name'], r['size']), r['best_seconds']) for r in old_results['results'])
+
+    for result in new_results['results']:
+        old_time = old_times.get((result['name'], result['size']))
+
+        if old_time is not None:
+            print('{} ({}): {:.9f}s -> {:.9f}s ({:.2f}x)'.format(
+                result['name'],
+                result['size'],
+                old_time,
+                result['best_seconds'],
+                old_time / result['best_seconds'] if result['best_seconds'] else float('inf')
+            ), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
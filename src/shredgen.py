@@ -1,14 +1,87 @@
 #!/usr/bin/env python3
 
 
-import argparse
+import abc
+import collections
+import itertools
 import os.path
 import random
 import sys
+import time
+import types
+
+# argparse, asyncio, concurrent.futures, cProfile, hashlib, json, mmap, struct & tempfile are imported by the functions
+# that need them, since they take longer to import than the rest of shredgen and most runs do not need all of them.
 
 _NOTES_IN_OCTAVE = 12
+_DEFAULT_SCALE = 'AMajPen'
 _DEFAULT_LENGTH = 16
+_DEFAULT_CHUNK_SIZE = 64
+_DEFAULT_COUNT = 1
+_DEFAULT_SERVE_HOST = 'localhost'
+_MAX_SERVE_LENGTH = 100000
+_MIN_SERVE_WORKERS = 2  # so that one long request cannot hold up every other client, even on one CPU
+_BATCH_READ_SIZE = 1 << 16
 _DEFAULT_TUNING = 'A'
+_DEFAULT_RIFF = 0
+_DEFAULT_MODEL = 'uniform'
+_MODELS = ('uniform', 'weighted', 'markov')
+_DEFAULT_RNG = 'sequential'
+_RNGS = ('sequential', 'counter')
+_DEFAULT_START = 0
+_DEFAULT_RANK = 0
+_MAX_SUGGESTIONS = 5
+_MAX_SUGGESTION_DISTANCE = 2
+_TABS_IN_FLIGHT_PER_WORKER = 2
+_UNRANK_SPLIT_LENGTH = 64  # digits of a rank that are divided out one at a time rather than split in half
+_DRAW_SLICE_SIZE = 1 << 12  # notes drawn into a list at a time before being copied into a riff's bytearray
+_MAX_CACHED_SCALES = 256  # more than the whole catalog, so --serve's warm up & --all-scales never evict a scale
+_MAX_CACHED_NOTE_MODELS = 256
+_CACHE_VERSION = 1  # bump whenever a change to the scale catalog or to rendering changes the output of cached commands
+_CACHE_PRUNE_AGE_SECONDS = 30 * 24 * 60 * 60  # how long other versions' cache entries go unwritten before removal
+
+# SplitMix64, which CounterRandom uses to turn a key & counter into a random number
+_MASK_64 = (1 << 64) - 1
+_SPLITMIX_GAMMA = 0x9E3779B97F4A7C15
+_SPLITMIX_MULTIPLIER_1 = 0xBF58476D1CE4E5B9
+_SPLITMIX_MULTIPLIER_2 = 0x94D049BB133111EB
+_FLOAT_SCALE = 2.0 ** -53
+
+# How much more likely the weighted & markov models are to draw a root note of the scale than any other note, and how
+# likely the markov model is to repeat the note before compared to stepping one semitone away from it
+_ROOT_NOTE_WEIGHT = 2.0
+_REPEATED_NOTE_WEIGHT = 0.25
+
+# Semitones from the open low E string to each open string
+_STRING_PITCHES = {'E': 0, 'A': 5, 'D': 10, 'G': 15, 'B': 19, 'e': 24}
+_LOW_E_KEY_NUM = 7
+
+# Scales built from a formula are played in one position: the frets from one below the scale's root on the low E string
+# to three above it, or the same number of frets from the nut when the root is the open string
+_POSITION_LOW_FRET_OFFSET = -1
+_POSITION_HIGH_FRET_OFFSET = 3
+
+# Families of scales built from a formula: the family's names, and the semitones above the root of each note
+_SCALE_FORMULAS = [
+    (['Minor Pentatonic', 'Min Pen'], [0, 3, 5, 7, 10]),
+    (['Blues'], [0, 3, 5, 6, 7, 10]),
+    (['Ionian', 'Major', 'Maj'], [0, 2, 4, 5, 7, 9, 11]),
+    (['Dorian', 'Dor'], [0, 2, 3, 5, 7, 9, 10]),
+    (['Phrygian', 'Phr'], [0, 1, 3, 5, 7, 8, 10]),
+    (['Lydian', 'Lyd'], [0, 2, 4, 6, 7, 9, 11]),
+    (['Mixolydian', 'Mix'], [0, 2, 4, 5, 7, 9, 10]),
+    (['Aeolian', 'Natural Minor', 'Minor', 'Min'], [0, 2, 3, 5, 7, 8, 10]),
+    (['Locrian', 'Loc'], [0, 1, 3, 5, 6, 8, 10]),
+    (['Harmonic Minor', 'Harm Min'], [0, 2, 3, 5, 7, 8, 11]),
+]
+
+# Corpus files are a header, the scale name, the file offset of each riff's notes plus the offset of the end of the last
+# riff's notes, then the notes of every riff as one byte per note: the index of that note in the scale's notes.
+_CORPUS_MAGIC = b'SHRC'
+_CORPUS_VERSION = 1
+_CORPUS_HEADER_FORMAT = '<4sBxHQ'  # magic, version, scale name length, riff count
+_CORPUS_OFFSET_FORMAT = '<Q'
+_CORPUS_RIFF_OFFSETS_FORMAT = '<2Q'  # the offset of a riff's notes and of the notes after them
 
 _KEYS = [
     ['A'],
@@ -25,33 +98,357 @@ _KEYS = [
     ['G#', 'G Sharp', 'GSharp', 'Ab', 'A Flat', 'AFlat']
 ]
 
+# Normalized key name -> key number, and (normalized tuning key, normalized original key) -> offset
+_KEY_NUMS = {''.join(name.split()).lower(): num for num, names in enumerate(_KEYS) for name in names}
+_KEY_OFFSETS = {
+    (tuning_key, orig_key): tuning_num - orig_num
+    for tuning_key, tuning_num in _KEY_NUMS.items()
+    for orig_key, orig_num in _KEY_NUMS.items()
+}
+_MAX_KEY_NAME_LENGTH = max(len(key) for key in _KEY_NUMS)
+
 _ERR_NO_SCALE_SPECIFIED = 2
 _ERR_UNKNOWN_SCALE = 3
 _ERR_LENGTH_NOT_INT = 4
 _ERR_LENGTH_TOO_LOW = 5
 _ERR_INVALID_KEY = 6
 _ERR_CANT_FIND_SCALES_OF_TYPE = 7
+_ERR_CHUNK_SIZE_NOT_INT = 8
+_ERR_CHUNK_SIZE_TOO_LOW = 9
+_ERR_SEED_NOT_INT = 10
+_ERR_COUNT_NOT_INT = 11
+_ERR_COUNT_TOO_LOW = 12
+_ERR_STREAM_WITH_COUNT = 13
+_ERR_INVALID_ADDRESS = 14
+_ERR_INVALID_REQUEST = 15
+_ERR_LENGTH_TOO_HIGH = 16
+_ERR_INVALID_CORPUS = 17
+_ERR_RIFF_NOT_INT = 18
+_ERR_RIFF_OUT_OF_RANGE = 19
+_ERR_UNKNOWN_MODEL = 20
+_ERR_MAX_FRET_JUMP_NOT_INT = 21
+_ERR_MAX_FRET_JUMP_TOO_LOW = 22
+_ERR_UNKNOWN_RNG = 23
+_ERR_START_NOT_INT = 24
+_ERR_START_TOO_LOW = 25
+_ERR_CANNOT_SEEK = 26
+_ERR_WORKERS_NOT_INT = 27
+_ERR_WORKERS_TOO_LOW = 28
+_ERR_CANNOT_PARALLELIZE = 29
+_ERR_RANK_NOT_INT = 30
+_ERR_RANK_OUT_OF_RANGE = 31
+
+# Fields that server & batch requests may have.  Each is handled the same way as the command line option of that name.
+_REQUEST_FIELDS = ('scale', 'tuning', 'length', 'seed', 'model', 'max_fret_jump', 'rng', 'start', 'only_tune')
+
+# Options that _parse_simple_opts() can parse: option -> (dest, whether the option takes a value)
+_SIMPLE_OPTS = {
+    '--all-scales': ('all_scales', False),
+    '--all-scale-names': ('all_scale_names', False),
+    '--batch': ('batch', False),
+    '--chunk-size': ('chunk_size', True),
+    '--corpus': ('corpus', True),
+    '--count': ('count', True),
+    '-c': ('count', True),
+    '--enumerate': ('enumerate', False),
+    '--export': ('export', True),
+    '--length': ('length', True),
+    '-l': ('length', True),
+    '--max-fret-jump': ('max_fret_jump', True),
+    '--model': ('model', True),
+    '--only-tune': ('only_tune', False),
+    '--profile': ('profile', False),
+    '--profile-file': ('profile_file', True),
+    '--cprofile-file': ('cprofile_file', True),
+    '--rank': ('rank', True),
+    '--riff': ('riff', True),
+    '--rng': ('rng', True),
+    '--seed': ('seed', True),
+    '--serve': ('serve', True),
+    '--start': ('start', True),
+    '--stream': ('stream', False),
+    '--tuning': ('tuning', True),
+    '-t': ('tuning', True),
+    '--workers': ('workers', True),
+}
+
+# Must match the defaults given to argparse in _parse_all_opts()
+_OPT_DEFAULTS = {
+    'scale': _DEFAULT_SCALE,
+    'all_scales': False,
+    'all_scale_names': False,
+    'batch': False,
+    'chunk_size': _DEFAULT_CHUNK_SIZE,
+    'corpus': None,
+    'count': _DEFAULT_COUNT,
+    'enumerate': False,
+    'export': None,
+    'length': _DEFAULT_LENGTH,
+    'max_fret_jump': None,
+    'model': _DEFAULT_MODEL,
+    'only_tune': False,
+    'profile': False,
+    'profile_file': None,
+    'cprofile_file': None,
+    'rank': _DEFAULT_RANK,
+    'riff': _DEFAULT_RIFF,
+    'rng': _DEFAULT_RNG,
+    'seed': None,
+    'serve': None,
+    'start': _DEFAULT_START,
+    'stream': False,
+    'tuning': _DEFAULT_TUNING,
+    'workers': None,
+}
+
+# How a riff's notes are drawn: the seed of the random number generator, the note model, the most frets between
+# consecutive notes (None for no limit), the random number generator, and the note of the riff to start from
+RiffOptions = collections.namedtuple('RiffOptions', ('seed', 'model', 'max_fret_jump', 'rng', 'start'))
+RiffOptions.__new__.__defaults__ = (None, _DEFAULT_MODEL, None, _DEFAULT_RNG, _DEFAULT_START)
+_DEFAULT_RIFF_OPTIONS = RiffOptions()
+
+_scale_registry = None  # pylint: disable=invalid-name
+_profiler = None  # pylint: disable=invalid-name
+_note_models = collections.OrderedDict()  # (model name, scale name, max fret jump) -> note model, least recently used
+_scale_name_index = None  # pylint: disable=invalid-name
+_key_name_index = None  # pylint: disable=invalid-name
 
 
 def main():
     err = None
+    opts = None
+    start = (time.perf_counter(), sys.getallocatedblocks())
 
     try:
         opts = _parse_opts()
         _update_default_opts(opts)
+        _start_profiling(opts, start)
         _perform_user_action(opts)
     except ExitCodeError as e:
         err = e.err_code
         _print_err_and_usage(e)
+    finally:
+        _stop_profiling(opts)
 
     sys.exit(0 if err is None else err)
 
 
-def _parse_opts():
+def get_scale(name):
+    """Returns the scale with the given name, which may be any of the scale's aliases.  Raises an UnknownScaleError if
+    there is no such scale."""
+    scale_name = name.strip().lower() if name else ''
+    _validate_scale_name(scale_name)
+
+    scale = _get_scale_by_name(scale_name)
+    _validate_scale(name, scale)
+
+    return scale
+
+
+def complete_scale_name(prefix, limit=_MAX_SUGGESTIONS):
+    """Returns up to the given number of scale names that start with the prefix, ignoring case & whitespace, in
+    alphabetical order."""
+    return _get_scale_name_index().complete(prefix, limit)
+
+
+def suggest_scale_names(name, limit=_MAX_SUGGESTIONS):
+    """Returns up to the given number of the scale names that are spelled most like the given name."""
+    return _get_scale_name_index().suggest(name, limit)
+
+
+def complete_key(prefix, limit=_MAX_SUGGESTIONS):
+    """Returns up to the given number of key names that start with the prefix, ignoring case & whitespace, in
+    alphabetical order."""
+    return _get_key_name_index().complete(prefix, limit)
+
+
+def suggest_keys(key, limit=_MAX_SUGGESTIONS):
+    """Returns up to the given number of the key names that are spelled most like the given key."""
+    return _get_key_name_index().suggest(key, limit)
+
+
+def tune_scale(scale, tuning):
+    """Returns the scale, or scale name, transposed from the key of A to the given tuning key.  Raises an
+    InvalidKeyError if the tuning key is unknown."""
+    return _get_tuned_scale(get_scale(scale) if isinstance(scale, str) else scale, tuning)
+
+
+def generate_riff(scale, tuning=_DEFAULT_TUNING, length=_DEFAULT_LENGTH, options=_DEFAULT_RIFF_OPTIONS):
+    """Returns a random Riff of the given length in the scale, or scale name, tuned to the given key, with its notes
+    drawn as the given RiffOptions say.  The notes are drawn by the options' model (uniform, weighted, or markov).
+    When given a max fret jump, consecutive notes are never more than that many frets apart.  Riffs generated with the
+    same integer seed are the same.  With the counter random number generator, the riff is the notes from the given
+    start of the riff that would be generated from the start, without generating the notes before it.  Raises an
+    InvalidOptionError if any option is invalid."""
+    tuned_scale = tune_scale(scale, tuning)
+    options = _parse_riff_options(options)
+
+    return _generate_riff(tuned_scale, _parse_length(length), _get_rng(options), options)
+
+
+def generate_riffs(  # pylint: disable=too-many-arguments
+        scale, tuning=_DEFAULT_TUNING, length=_DEFAULT_LENGTH, count=_DEFAULT_COUNT, options=_DEFAULT_RIFF_OPTIONS,
+        max_workers=None):
+    """Returns a list of the given number of random Riffs, generated like generate_riff() in parallel by up to
+    max_workers worker processes (default: the number of CPUs).  Each riff is generated from its own seed, drawn from
+    the options' seed, so the riffs are the same for a given seed no matter how many workers there are.  Raises an
+    InvalidOptionError if any option is invalid."""
+    tuned_scale = tune_scale(scale, tuning)
+    options = _parse_riff_options(options)
+
+    return _generate_riffs(
+        tuned_scale, _parse_length(length), _parse_count(count), options, _parse_workers(max_workers))
+
+
+def render_tab(notes):
+    """Returns the notes, e.g. a Riff or a scale's notes, as an ASCII tab."""
+    return str(ASCIITab(notes))
+
+
+def write_corpus(path, riffs):
+    """Writes the riffs, which must all be in the same scale, to a corpus file.  Any one riff can then be read from the
+    file by a RiffCorpus without reading the others."""
+    import struct  # pylint: disable=import-outside-toplevel
+
+    riffs = list(riffs)
+
+    if len({riff.scale.name for riff in riffs}) > 1:
+        raise ValueError('Every riff in a corpus must be in the same scale')
+
+    scale_name = (riffs[0].scale.name if riffs else '').encode('utf-8')
+    notes_start = (
+        struct.calcsize(_CORPUS_HEADER_FORMAT)
+        + len(scale_name)
+        + struct.calcsize(_CORPUS_OFFSET_FORMAT) * (len(riffs) + 1))
+    offsets = itertools.accumulate(itertools.chain([notes_start], (len(riff) for riff in riffs)))
+
+    with _phase('output'), open(path, 'wb') as f:
+        f.write(struct.pack(_CORPUS_HEADER_FORMAT, _CORPUS_MAGIC, _CORPUS_VERSION, len(scale_name), len(riffs)))
+        f.write(scale_name)
+        f.write(b''.join(struct.pack(_CORPUS_OFFSET_FORMAT, offset) for offset in offsets))
+
+        for riff in riffs:
+            f.write(riff.indices)
+
+
+def rank_riff(riff):
+    """Returns the position of the riff among every riff of its length in its scale, ordered by the indices of their
+    notes in the scale.  The riff's indices are the digits of its rank in base len(riff.scale.notes)."""
+    radix = len(riff.scale.notes)
+    rank = 0
+
+    for index in riff.indices:
+        rank = rank * radix + index
+
+    return rank
+
+
+def unrank_riff(scale, length, rank):
+    """Returns the riff of the given length in the scale at the given position, the riff that rank_riff() ranks as
+    that position.  Raises an InvalidOptionError if the rank is not a position of a riff of that length."""
+    radix = len(scale.notes)
+    rank = _parse_rank(rank, radix, length, radix ** length)
+
+    return Riff(scale, _unrank_indices(rank, radix, length))
+
+
+def enumerate_riffs(scale, length, rank=_DEFAULT_RANK, count=None):
+    """Yields the given number of riffs of the given length in the scale, or every riff after, in rank order starting
+    at the given rank.  Riffs are made as they are needed, so any part of the riffs can be yielded without making the
+    riffs before it.  Raises an InvalidOptionError if the rank is not a position of a riff of that length."""
+    radix = len(scale.notes)
+    riff_count = radix ** length
+    rank = _parse_rank(rank, radix, length, riff_count)
+    stop = riff_count if count is None else min(riff_count, rank + count)
+    indices = _unrank_indices(rank, radix, length)
+
+    for _ in range(rank, stop):
+        yield Riff(scale, bytes(indices))
+
+        # Add one to the indices, the digits of the rank, carrying into the digits before
+        i = length - 1
+
+        while i >= 0 and indices[i] == radix - 1:
+            indices[i] = 0
+            i -= 1
+
+        if i >= 0:
+            indices[i] += 1
+
+
+def _unrank_indices(rank, radix, length):
+    """Returns a bytearray of the given number of base radix digits of the rank, most significant first.  Dividing a
+    long rank by the radix once per digit takes time quadratic in the length, so long ranks are first split in half by
+    dividing by a power of the radix, until each part has few enough digits to divide digit by digit."""
+    indices = bytearray(length)
+    powers = {}  # number of digits -> radix to that power
+    parts = [(rank, 0, length)]  # rank of the part, index of its first digit, number of digits
+
+    while parts:
+        part_rank, start, part_length = parts.pop()
+
+        if part_length <= _UNRANK_SPLIT_LENGTH:
+            for i in range(start + part_length - 1, start - 1, -1):
+                part_rank, indices[i] = divmod(part_rank, radix)
+        else:
+            low_length = part_length // 2
+
+            if low_length not in powers:
+                powers[low_length] = radix ** low_length
+
+            high_rank, low_rank = divmod(part_rank, powers[low_length])
+            parts.append((high_rank, start, part_length - low_length))
+            parts.append((low_rank, start + part_length - low_length, low_length))
+
+    return indices
+
+
+def _parse_opts(args=None):
+    args = sys.argv[1:] if args is None else args
+    return _parse_simple_opts(args) or _parse_all_opts(args)
+
+
+def _parse_simple_opts(args):
+    """Parses the most common usages without importing argparse, which takes longer to import than the rest of shredgen.
+    Returns None for anything else (e.g. help, abbreviated options, or invalid usage), which argparse must handle."""
+    opts = dict(_OPT_DEFAULTS)
+    positionals = []
+    args = iter(args)
+
+    for arg in args:
+        opt = _SIMPLE_OPTS.get(arg)
+
+        if opt is None:
+            if arg.startswith('-') or positionals:
+                return None
+
+            positionals.append(arg)
+        else:
+            dest, takes_value = opt
+
+            if takes_value:
+                value = next(args, None)
+
+                if value is None or value.startswith('-'):
+                    return None
+
+                opts[dest] = value
+            else:
+                opts[dest] = True
+
+    if positionals:
+        opts['scale'] = positionals[0]
+
+    return types.SimpleNamespace(**opts)
+
+
+def _parse_all_opts(args):
+    import argparse  # pylint: disable=import-outside-toplevel
+
     parser = argparse.ArgumentParser(description='Generate boring rifts that solidify faces')
 
     # Positional Arguments
-    parser.add_argument('scale', nargs='?', metavar='scale', default='AMajPen',
+    parser.add_argument('scale', nargs='?', metavar='scale', default=_DEFAULT_SCALE,
                         help='The scale to be used (default: %(default)s)')
 
     # Optional Arguments
@@ -59,23 +456,132 @@ def _parse_opts():
                         help='Display all possible scales')
     parser.add_argument('--all-scale-names', action='store_true', default=False, dest='all_scale_names',
                         help='Display all possible scale names')
+    parser.add_argument('--batch', action='store_true', default=False, dest='batch',
+                        help='Read JSON requests from stdin, one per line, and write a line of JSON to stdout for '
+                             'each.  Requests & responses are the same as for --serve (default: %(default)s)')
+    parser.add_argument('--chunk-size', default=_DEFAULT_CHUNK_SIZE, dest='chunk_size',
+                        help='Number of notes in each tab when streaming (default: %(default)s)')
+    parser.add_argument('--corpus', default=None, dest='corpus',
+                        help='Do not shred.  Instead, show one riff from this corpus file written by --export.  '
+                             'Only that riff is read from the file.')
+    parser.add_argument('--count', '-c', default=_DEFAULT_COUNT, dest='count',
+                        help='Number of riffs to generate.  Multiple riffs are generated in parallel by worker '
+                             'processes (default: %(default)s)')
+    parser.add_argument('--enumerate', action='store_true', default=False, dest='enumerate',
+                        help='Instead of random riffs, show --count riffs in order from the riff at --rank, out of '
+                             'every riff of the length in the scale (default: %(default)s)')
+    parser.add_argument('--export', default=None, dest='export',
+                        help='Write the riffs to this corpus file instead of showing them.  Riff N of the corpus is '
+                             'the Nth riff that would have been shown.')
     parser.add_argument('--length', '-l', default=_DEFAULT_LENGTH, dest='length',
                         help='Number of notes to generate (default: %(default)s)')
+    parser.add_argument('--max-fret-jump', default=None, dest='max_fret_jump',
+                        help='Most frets that consecutive notes may be apart, to keep riffs playable (default: no '
+                             'limit)')
+    parser.add_argument('--model', default=_DEFAULT_MODEL, dest='model',
+                        help='How notes are drawn from the scale: uniform, weighted toward the root notes, or markov, '
+                             'a markov chain weighted toward the root notes and small steps from the note before '
+                             '(default: %(default)s)')
     parser.add_argument('--only-tune', action='store_true', default=False, dest='only_tune',
                         help='Do not shred.  Instead, show the scale that will be used based on the requested scale '
                              'and tuning (default: %(default)s).')
+    parser.add_argument('--profile', action='store_true', default=False, dest='profile',
+                        help='Report the time spent & memory blocks allocated in each phase of the run as JSON on '
+                             'stderr (default: %(default)s)')
+    parser.add_argument('--profile-file', default=None, dest='profile_file',
+                        help='Profile the run, writing the JSON report to this file instead of stderr')
+    parser.add_argument('--cprofile-file', default=None, dest='cprofile_file',
+                        help='Profile the run, also writing cProfile stats to this file')
+    parser.add_argument('--rank', default=_DEFAULT_RANK, dest='rank',
+                        help='Position of the first riff to show with --enumerate, counting from 0 (default: '
+                             '%(default)s)')
+    parser.add_argument('--riff', default=_DEFAULT_RIFF, dest='riff',
+                        help='Index of the riff to show from the --corpus file (default: %(default)s)')
+    parser.add_argument('--rng', default=_DEFAULT_RNG, dest='rng',
+                        help='Random number generator: sequential or counter.  The counter generator computes the '
+                             'random number for each note from the seed and the note\'s position alone, so --start can '
+                             'skip straight to any note of a riff (default: %(default)s)')
+    parser.add_argument('--seed', default=None, dest='seed',
+                        help='Integer used to seed the random number generator so that riffs can be reproduced '
+                             '(default: random)')
+    parser.add_argument('--serve', default=None, dest='serve', metavar='ADDRESS',
+                        help='Serve riffs to many clients from one long-running process.  The address is a port '
+                             'on localhost, a HOST:PORT, or the path of a Unix socket.  Each line sent to the server '
+                             'must be a JSON request with any of these fields: {}.  Each response is a line of '
+                             'JSON.'.format(
+                                 ', '.join(_REQUEST_FIELDS)))
+    parser.add_argument('--start', default=_DEFAULT_START, dest='start',
+                        help='Position in the riff of the first note to generate.  The notes before it are '
+                             'skipped without being generated.  Requires --rng counter, and a model that does not '
+                             'depend on the note before (default: %(default)s)')
+    parser.add_argument('--stream', action='store_true', default=False, dest='stream',
+                        help='Print the notes as a series of tabs, each printed as soon as it is generated, instead of '
+                             'one tab (default: %(default)s)')
     parser.add_argument('--tuning', '-t', default=_DEFAULT_TUNING, dest='tuning',
                         help='Guitar tuning key (default: %(default)s)')
+    parser.add_argument('--workers', default=None, dest='workers',
+                        help='Number of worker processes.  With --count, the most workers that generate the riffs.  '
+                             'With --stream and --rng counter, the workers generate & render the tabs of one riff, '
+                             'which are printed in order and are the same as with one worker.  With --serve, the '
+                             'workers that answer requests (default: the number of CPUs with --count, the number of '
+                             'CPUs but at least {} with --serve, otherwise 1)'.format(_MIN_SERVE_WORKERS))
 
-    return parser.parse_args()
+    return parser.parse_args(args)
 
 
 def _update_default_opts(opts):
     opts.length = _DEFAULT_LENGTH if opts.length is None else opts.length
 
 
+def _start_profiling(opts, start):
+    """Starts profiling if requested.  The given start time & allocated block count are recorded as the time it took
+    to parse the options."""
+    global _profiler  # pylint: disable=global-statement
+
+    if opts.profile or opts.profile_file or opts.cprofile_file:
+        _profiler = Profiler(start, cprofile=bool(opts.cprofile_file))
+
+
+def _stop_profiling(opts):
+    global _profiler  # pylint: disable=global-statement
+
+    if _profiler is not None:
+        profiler = _profiler
+        _profiler = None
+        results = profiler.stop_all()
+
+        # Imported once profiling has stopped, so that the import is not counted in the report
+        import json  # pylint: disable=import-outside-toplevel
+
+        report = json.dumps(results, indent=2, sort_keys=True)
+
+        if opts.profile_file:
+            with open(opts.profile_file, 'w', encoding='utf-8') as f:
+                f.write(report + '\n')
+        else:
+            print(report, file=sys.stderr)
+
+        if opts.cprofile_file:
+            profiler.dump_cprofile_stats(opts.cprofile_file)
+
+
+def _phase(name):
+    """Returns a context manager that records the code it wraps as the given phase of the run when profiling."""
+    return ProfilerPhase(_profiler, name)
+
+
 def _perform_user_action(opts):
-    if opts.all_scales:
+    if opts.serve:
+        _serve(opts)
+    elif opts.batch:
+        _batch(sys.stdin.buffer, sys.stdout.buffer)
+    elif opts.corpus:
+        _display_corpus_riff(opts)
+    elif opts.export:
+        _export_corpus(opts)
+    elif opts.enumerate:
+        _display_enumerated_riffs(opts)
+    elif opts.all_scales:
         _display_all_scales(opts)
     elif opts.all_scale_names:
         _display_all_scale_names()
@@ -93,300 +599,1732 @@ def _display_all_scales(opts):
 
 
 def _display_all_scales_no_tuning():
-    print('\n\n'.join(['{}\n{}'.format(scale.name, ASCIITab(scale.notes)) for scale in _get_all_scales()]))
+    _print_cached(('all-scales',), lambda: '\n\n'.join([
+        '{}\n{}'.format(scale.name, ASCIITab(scale.notes)) for scale in _get_all_scales()
+    ]))
 
 
 def _display_all_scales_with_tuning(opts):
-    scale_strs = []
+    def render():
+        scale_strs = []
 
-    for scale in _get_all_scales():
-        tuned_scale = _get_tuned_scale(scale, opts.tuning)
+        for scale in _get_all_scales():
+            tuned_scale = _get_tuned_scale(scale, opts.tuning)
 
-        scale_str = 'Original Scale: {}\n{}'.format(scale.name, ASCIITab(scale.notes))
-        tuned_str = 'Tuned Scale: {}\n{}'.format(tuned_scale.name, ASCIITab(tuned_scale.notes))
+            scale_str = 'Original Scale: {}\n{}'.format(scale.name, ASCIITab(scale.notes))
+            tuned_str = 'Tuned Scale: {}\n{}'.format(tuned_scale.name, ASCIITab(tuned_scale.notes))
 
-        scale_strs.append(_join_multiline_strings(scale_str, tuned_str))
+            scale_strs.append(_join_multiline_strings(scale_str, tuned_str))
 
-    print('\n\n'.join(scale_strs))
+        return '\n\n'.join(scale_strs)
+
+    _print_cached(('all-scales', _get_key_num(opts.tuning)), render)
 
 
 def _display_all_scale_names():
-    print('\n'.join(['{} ({})'.format(scale.name, ', '.join(scale.aliases)) for scale in _get_all_scales()]))
+    with _phase('output'):
+        print('\n'.join(['{} ({})'.format(scale.name, ', '.join(scale.aliases)) for scale in _get_all_scales()]))
 
 
 def _display_tuning(opts):
     scale_name = opts.scale.strip().lower() if opts.scale else ''
     _validate_scale_name(scale_name)
 
+    _print_cached(
+        ('only-tune', _normalize_name(scale_name), _get_key_num(opts.tuning)),
+        lambda: _render_tuning(opts, scale_name))
+
+
+def _render_tuning(opts, scale_name):
     scale = _get_scale_by_name(scale_name)
-    _validate_scale(opts, scale)
+    _validate_scale(opts.scale, scale)
 
     tuned_scale = _get_tuned_scale(scale, opts.tuning)
 
-    print('Original Scale: {}\n{}\n\nTuned Scale: {}\n{}'.format(
+    return 'Original Scale: {}\n{}\n\nTuned Scale: {}\n{}'.format(
         scale.name,
         ASCIITab(scale.notes),
         tuned_scale.name,
-        ASCIITab(tuned_scale.notes)))
+        ASCIITab(tuned_scale.notes))
+
+
+def _print_cached(key, render):
+    """Prints the output of render(), which must depend only on the key & scale catalog, cached on disk by key."""
+    with _phase('cache'):
+        path = _get_cache_path(key)
+
+        try:
+            with open(path, encoding='utf-8') as f:
+                output = f.read()
+        except OSError:
+            output = None
+
+    if output is None:
+        output = render()
+
+        with _phase('cache'):
+            _write_cache(path, output)
+
+    with _phase('output'):
+        print(output)
+
+
+def _get_cache_path(key):
+    """Returns the path of the key's cache file, in a directory of its own for this _CACHE_VERSION."""
+    import hashlib  # pylint: disable=import-outside-toplevel
+
+    name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    return os.path.join(_get_cache_dir(), 'v{}'.format(_CACHE_VERSION), name + '.txt')
+
+
+def _get_cache_dir():
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'shredgen')
+
+
+def _write_cache(path, output):
+    """Writes the output to a temporary file and then renames it, so that other processes never read a partially
+    written cache file.  Failing to write the cache is not an error."""
+    import tempfile  # pylint: disable=import-outside-toplevel
+
+    temp_path = None
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+
+        with open(temp_fd, 'w', encoding='utf-8') as f:
+            f.write(output)
+
+        os.replace(temp_path, path)
+        _prune_cache(os.path.dirname(path))
+    except OSError:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _prune_cache(version_dir):
+    """Removes everything in the cache directory but the given directory of this version's entries that has not been
+    written for _CACHE_PRUNE_AGE_SECONDS, so that the entries of other copies of shredgen still in use are kept.
+    Entries that cannot be removed, e.g. because another process is writing them, are left for a later write to
+    remove."""
+    cache_dir, version = os.path.split(version_dir)
+    cutoff = time.time() - _CACHE_PRUNE_AGE_SECONDS
+
+    for name in os.listdir(cache_dir):
+        if name == version:
+            continue
+
+        path = os.path.join(cache_dir, name)
+
+        try:
+            if os.path.getmtime(path) > cutoff:
+                continue
+
+            if os.path.isdir(path):
+                for entry_name in os.listdir(path):
+                    os.remove(os.path.join(path, entry_name))
+
+                os.rmdir(path)
+            else:
+                os.remove(path)
+        except OSError:
+            pass
 
 
 def _shred(opts):
-    scale_name = opts.scale.strip().lower() if opts.scale else ''
-    _validate_scale_name(scale_name)
+    scale = tune_scale(get_scale(opts.scale), opts.tuning)
+    length = _parse_length(opts.length)
+    chunk_size = None
 
-    scale = _get_scale_by_name(scale_name)
-    _validate_scale(opts, scale)
+    if opts.stream:
+        chunk_size_str = str(opts.chunk_size).strip()
+        _validate_chunk_size(chunk_size_str)
+        chunk_size = int(chunk_size_str)
+
+    options = _get_riff_options(opts)
+
+    count_str = str(opts.count).strip()
+    _validate_count(count_str, opts.stream)
+    count = int(count_str)
+
+    workers = _parse_workers(opts.workers)
+
+    if count > 1:
+        _shred_many_in_scale(scale, length, count, options, workers)
+    elif workers is not None and workers > 1:
+        _validate_parallel(opts.stream, options.rng, options.model, options.max_fret_jump)
+        _shred_in_scale_in_parallel(scale, length, chunk_size, options, workers)
+    else:
+        _shred_in_scale(scale, length, chunk_size, _get_rng(options), options)
+
+
+def _display_enumerated_riffs(opts):
+    scale = tune_scale(get_scale(opts.scale), opts.tuning)
+    length = _parse_length(opts.length)
+
+    count_str = str(opts.count).strip()
+    _validate_count(count_str, False)
+
+    for i, riff in enumerate(enumerate_riffs(scale, length, opts.rank, int(count_str))):
+        with _phase('output'):
+            print('{}{}'.format('\n' if i else '', ASCIITab(riff)))
+
+
+def _export_corpus(opts):
+    scale = tune_scale(get_scale(opts.scale), opts.tuning)
+    length = _parse_length(opts.length)
+    options = _get_riff_options(opts)
 
-    length_str = str(opts.length).strip()
+    count_str = str(opts.count).strip()
+    _validate_count(count_str, False)
+    count = int(count_str)
+
+    # The riffs are generated the same way that _shred() generates them, so the same options give the same riffs
+    if count == 1:
+        riffs = [_generate_riff(scale, length, _get_rng(options), options)]
+    else:
+        with _phase('generation'):
+            riffs = _generate_riffs(scale, length, count, options)
+
+    write_corpus(opts.export, riffs)
+
+
+def _display_corpus_riff(opts):
+    riff_str = str(opts.riff).strip()
+
+    with RiffCorpus(opts.corpus) as corpus:
+        _validate_riff_index(riff_str, len(corpus))
+        riff = corpus[int(riff_str)]
+
+    with _phase('output'):
+        print(ASCIITab(riff))
+
+
+def _parse_length(length):
+    length_str = str(length).strip()
     _validate_length(length_str)
-    length = int(length_str)
+    return int(length_str)
 
-    _shred_in_scale(scale, length)
 
+def _parse_count(count):
+    count_str = str(count).strip()
+    _validate_count(count_str, False)
+    return int(count_str)
 
-def _validate_scale_name(scale_name):
-    if not scale_name:
-        raise ExitCodeError('A scale must be specified.', _ERR_NO_SCALE_SPECIFIED)
 
+def _parse_seed(seed):
+    if seed is not None:
+        seed_str = str(seed).strip()
+        _validate_seed(seed_str)
+        seed = int(seed_str)
 
-def _validate_scale(opts, scale):
-    if not scale:
-        basename = _basename()
-        raise ExitCodeError(
-            'Unknown scale: {}\n'
-            'To see all supported scale names, execute: {} --all-scale-names\n'
-            'To see all supported scales, execute: {} --all-scales'.format(opts.scale, basename, basename),
-            _ERR_UNKNOWN_SCALE)
+    return seed
 
 
-def _validate_length(length):
-    try:
-        length = int(length, 10)
-    except ValueError as e:
-        raise ExitCodeError('Length must be an integer.', _ERR_LENGTH_NOT_INT) from e
+def _parse_model(model):
+    model_str = str(model).strip().lower()
+    _validate_model(model_str)
+    return model_str
 
-    if length < 1:
-        raise ExitCodeError('Length must be greater than zero', _ERR_LENGTH_TOO_LOW)
 
+def _parse_max_fret_jump(max_fret_jump):
+    if max_fret_jump is not None:
+        max_fret_jump_str = str(max_fret_jump).strip()
+        _validate_max_fret_jump(max_fret_jump_str)
+        max_fret_jump = int(max_fret_jump_str)
 
-def _shred_in_scale(scale, length):
-    scale_notes_len = len(scale.notes)
-    print(ASCIITab([scale.notes[random.randrange(scale_notes_len)] for _ in range(length)]))
+    return max_fret_jump
 
 
-def _get_scale_by_name(name):
-    name = name.lower()
-    return next((scale for scale in _get_all_scales() if name in [alias.lower() for alias in scale.aliases]), None)
+def _parse_rank(rank, radix, length, riff_count):
+    """Returns the rank, which may be an int or a string.  Ints are never converted to strings, since ranks of long
+    riffs can have more digits than Python will convert."""
+    _validate_rank(rank, radix, length, riff_count)
+    return rank if isinstance(rank, int) else int(str(rank).strip())
 
 
-def _get_tuned_scale(scale, tuning_key):
-    offset = _get_key_offset(tuning_key)
-    adjusted_scale = scale
+def _parse_rng(rng):
+    rng_str = str(rng).strip().lower()
+    _validate_rng(rng_str)
+    return rng_str
 
-    if offset != 0:
-        all_scales = _get_all_scales_of_type(scale) or []
 
-        try:
-            starting_index = all_scales.index(scale)
-        except ValueError as e:
-            raise ExitCodeError(
-                'Could not find other scales of same type as this:\n{}'.format(scale),
-                _ERR_CANT_FIND_SCALES_OF_TYPE
-            ) from e
+def _parse_start(start, rng, model, max_fret_jump):
+    start_str = str(start).strip()
+    _validate_start(start_str, rng, model, max_fret_jump)
+    return int(start_str)
 
-        adjusted_scale = all_scales[(starting_index + offset) % len(all_scales)]
 
-    return adjusted_scale
+def _parse_workers(workers):
+    if workers is not None:
+        workers_str = str(workers).strip()
+        _validate_workers(workers_str)
+        workers = int(workers_str)
 
+    return workers
 
-def _get_all_scales_of_type(scale):
-    all_scales = None
 
-    if isinstance(scale, MajorPentatonicScale):
-        all_scales = _get_major_pentatonic_scales()
+def _get_rng(options):
+    """Returns the random number generator that the given RiffOptions name, seeded with their seed and, for the counter
+    generator, positioned at their start."""
+    if options.rng == 'counter':
+        return CounterRandom(options.seed, options.start)
 
-    return all_scales
+    return random.Random(options.seed)
 
 
-def _get_all_scales():
-    return _get_major_pentatonic_scales()
+def _get_riff_options(opts):
+    """Returns the parsed RiffOptions given by the options of the same names."""
+    return _parse_riff_options(RiffOptions(opts.seed, opts.model, opts.max_fret_jump, opts.rng, opts.start))
 
 
-def _get_major_pentatonic_scales():
-    a_maj_pen = MajorPentatonicScale('A', [
-        Note('E', 5), Note('E', 6), Note('E', 8),
-        Note('A', 5), Note('A', 7), Note('A', 8),
-        Note('D', 5), Note('D', 7), Note('D', 8),
-        Note('G', 5), Note('G', 7),
-        Note('B', 5), Note('B', 6), Note('B', 8),
-        Note('e', 5), Note('e', 6), Note('e', 8),
-    ])
-
-    return [
-        a_maj_pen,
-        MajorPentatonicScale.from_other(a_maj_pen, 1, 'A#'),
-        MajorPentatonicScale.from_other(a_maj_pen, 2, 'B'),
-        MajorPentatonicScale.from_other(a_maj_pen, 3, 'C'),
-        MajorPentatonicScale.from_other(a_maj_pen, 4, 'C#', wrap=False),
-        MajorPentatonicScale.from_other(a_maj_pen, 5, 'D', wrap=False),
-        MajorPentatonicScale.from_other(a_maj_pen, 6, 'D#', wrap=False),
-        MajorPentatonicScale.from_other(a_maj_pen, 7, 'E'),
-        MajorPentatonicScale.from_other(a_maj_pen, 8, 'F'),
-        MajorPentatonicScale.from_other(a_maj_pen, 9, 'F#'),
-        MajorPentatonicScale.from_other(a_maj_pen, 10, 'G'),
-        MajorPentatonicScale.from_other(a_maj_pen, 11, 'G#'),
-    ]
+def _parse_riff_options(options):
+    """Returns the given RiffOptions with each option validated & converted, as the command line options of the same
+    names are."""
+    model = _parse_model(options.model)
+    max_fret_jump = _parse_max_fret_jump(options.max_fret_jump)
+    rng = _parse_rng(options.rng)
+    start = _parse_start(options.start, rng, model, max_fret_jump)
 
+    return RiffOptions(_parse_seed(options.seed), model, max_fret_jump, rng, start)
 
-def _get_key_offset(tuning_key, orig_key='A'):
-    return _get_key_num(tuning_key) - _get_key_num(orig_key)
 
+def _serve(opts):
+    """Answers requests from clients in a pool of worker processes until interrupted."""
+    import asyncio  # pylint: disable=import-outside-toplevel
+    import concurrent.futures  # pylint: disable=import-outside-toplevel
 
-def _get_key_num(key):
-    ckey = str(key).lower()
-    key_num = next((i for i, names in enumerate(_KEYS) if ckey in [name.lower() for name in names]), None)
+    host, port, path = _parse_address(opts.serve)
+    workers = _parse_workers(opts.workers)
+    _warm_up()
 
-    if key_num is None:
-        raise ExitCodeError(
-            'Invalid key: {}\nKey must be one of: {}'.format(
-                key,
-                ', '.join([k for keys in _KEYS for k in keys])
-            ), _ERR_INVALID_KEY)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    executor = concurrent.futures.ProcessPoolExecutor(workers or max(_MIN_SERVE_WORKERS, os.cpu_count() or 1))
 
-    return key_num
+    def handle_connection(reader, writer):
+        return _handle_connection(reader, writer, executor)
 
+    if path is None:
+        server = loop.run_until_complete(asyncio.start_server(handle_connection, host, port))
+    else:
+        server = loop.run_until_complete(asyncio.start_unix_server(handle_connection, path))
 
-def _basename():
-    return os.path.basename(sys.argv[0])
+    print('Serving riffs on {}'.format(opts.serve), file=sys.stderr, flush=True)
 
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.close()
+        executor.shutdown()
 
-def _print_err_and_usage(err):
-    print('{}\nFor usage, execute: {} -h'.format(err, _basename()), file=sys.stderr)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
 
 
-def _join_multiline_strings(str1, str2, sep='  '):  # TODO unit test
-    lines_1 = str(str1 or '').splitlines()
-    lines_2 = str(str2 or '').splitlines()
-    line_count_1 = len(lines_1)
-    line_count_2 = len(lines_2)
-    max_line_length_1 = len(max(lines_1, key=len) if lines_1 else '')
-    lines = []
+def _batch(stdin, stdout):
+    """Writes a JSON response line to the stdout for each JSON request line read from the stdin, in the same order.
+    Lines are read & written many at a time, and the scale catalog is shared by every request."""
+    while True:
+        lines = stdin.readlines(_BATCH_READ_SIZE)
 
-    for x in range(0, max(line_count_1, line_count_2)):
-        line = ''
+        if not lines:
+            break
 
-        if x < line_count_1:
-            line += lines_1[x].ljust(max_line_length_1, ' ')
-        else:
-            line += ''.ljust(max_line_length_1, ' ')
+        stdout.writelines([_handle_request_line(line) for line in lines])
 
-        line += sep if sep else ''
+    stdout.flush()
 
-        if x < line_count_2:
-            line += lines_2[x]
 
-        lines.append(line)
+def _parse_address(address):
+    """Returns the (host, port, Unix socket path) of the given address.  Either the host & port or the path is None."""
+    address = str(address).strip()
+    host, _, port = address.rpartition(':')
 
-    return '\n'.join(lines)
+    if '/' in address:
+        return None, None, address
 
+    if not port.isdigit():
+        raise InvalidOptionError(
+            'Invalid address: {}\nAddress must be a port, a HOST:PORT, or a path to a Unix socket'.format(address),
+            _ERR_INVALID_ADDRESS)
 
-class Note:
-    def __init__(self, string, fret):
-        self.string = string
-        self.fret = fret
-
-    def __eq__(self, other):
-        return (
-            Note == other.__class__
-            and self.string == other.string
-            and self.fret == other.fret
-        )
+    return host or _DEFAULT_SERVE_HOST, int(port), None
 
-    def __hash__(self):
-        return (
-            hash(self.string)
-            ^ hash(self.fret)
-        )
 
-    def __str__(self):
-        return self.string + str(self.fret)
+def _warm_up():
+    for scale in _get_all_scales():
+        str(ASCIITab(scale.notes))
 
-    def offset(self, offset, wrap=True):
-        offset_fret = self.fret + offset
+    _get_scale_name_index().index_suggestions()
+    _get_key_name_index().index_suggestions()
 
-        if wrap:
-            offset_fret %= _NOTES_IN_OCTAVE
 
-        return Note(self.string, offset_fret)
+async def _handle_connection(reader, writer, executor=None):
+    """Answers each request line sent on the connection with a response line, computed in the given executor, until
+    the client disconnects."""
+    import asyncio  # pylint: disable=import-outside-toplevel
 
+    loop = asyncio.get_event_loop()
 
-class Scale:
-    def __init__(self, name, key, aliases, notes):
-        self.name = name
-        self.key = key
-        self.aliases = aliases
-        self.notes = notes
+    try:
+        while True:
+            line = await reader.readline()
 
-    def __str__(self):
-        return '{} {{{}}}'.format(self.name, ', '.join(str(n) for n in self.notes))
+            if not line:
+                break
 
+            writer.write(await loop.run_in_executor(executor, _handle_request_line, line, _MAX_SERVE_LENGTH))
+            await writer.drain()
+    finally:
+        writer.close()
 
-class MajorPentatonicScale(Scale):
-    def __init__(self, key, notes):
-        super().__init__(
-            name='{} Major Pentatonic'.format(key),
-            key=key,
-            aliases=self._get_aliases_for_key(key),
-            notes=notes
-        )
 
-    def __eq__(self, other):
-        return (
-            MajorPentatonicScale == other.__class__
-            and self.name == other.name
-            and set(self.notes) == set(other.notes)
-        )
+def _handle_request_line(line, max_length=None):
+    """Returns the JSON response line, as bytes, to the given JSON request line."""
+    import json  # pylint: disable=import-outside-toplevel
 
-    @staticmethod
-    def from_other(other, offset, key, wrap=True):
-        return MajorPentatonicScale(key, [n.offset(offset, wrap) for n in other.notes])
+    try:
+        request = json.loads(line.decode('utf-8') if isinstance(line, bytes) else line)
+    except ValueError as e:
+        response = {'error': 'Invalid request: {}'.format(e), 'err_code': _ERR_INVALID_REQUEST}
+    else:
+        response = _handle_request(request, max_length)
 
-    @staticmethod
-    def _get_aliases_for_key(key):
-        return [
-            '{} Major Pentatonic'.format(key),
-            '{}MajorPentatonic'.format(key),
-            '{} Maj Pen'.format(key),
-            '{}MajPen'.format(key),
-        ]
+    return (json.dumps(response) + '\n').encode('utf-8')
 
 
-class ASCIITab:
-    def __init__(self, notes):
-        self.notes = notes
-        self._strings = ['e', 'B', 'G', 'D', 'A', 'E']
+def _handle_request(request, max_length=None):
+    """Shreds, or shows the tuned scale when only_tune is set, as the command line would for the given request.
+    Returns the result as a JSON-serializable dict.  Errors are returned instead of raised, so that one bad request
+    does not affect the others."""
+    try:
+        opts = _get_request_opts(request)
 
-    def __str__(self):
-        string_lines = dict()
-        for string in self._strings:
-            string_lines[string] = []
+        if opts.only_tune:
+            scale_name = opts.scale.strip().lower() if opts.scale else ''
+            _validate_scale_name(scale_name)
+            return {'tab': _render_tuning(opts, scale_name)}
 
-        for note in self.notes:
-            for string, line in string_lines.items():
-                placeholder = '-' if note.fret < 10 else '--'
-                line.append(str(note.fret) if string == note.string else placeholder)
+        length = _parse_length(opts.length)
 
-        return '\n'.join([self._format_string_line(string, string_lines) for string in self._strings])
+        if max_length is not None and length > max_length:
+            raise InvalidOptionError('Length must be at most {}'.format(max_length), _ERR_LENGTH_TOO_HIGH)
 
-    @staticmethod
-    def _format_string_line(string, string_lines):
-        return '{}|-{}-'.format(string, '--'.join(string_lines.get(string)))
+        options = RiffOptions(opts.seed, opts.model, opts.max_fret_jump, opts.rng, opts.start)
+        riff = generate_riff(opts.scale, opts.tuning, length, options)
 
+        return {'scale': riff.scale.name, 'notes': [str(note) for note in riff], 'tab': render_tab(riff)}
+    except ExitCodeError as e:
+        return {'error': str(e), 'err_code': e.err_code}
 
-class ExitCodeError(Exception):
-    def __init__(self, message, err_code):
-        super().__init__(message)
-        self.err_code = err_code
+
+def _get_request_opts(request):
+    """Returns the options for a request, with the command line defaults for any fields the request does not have."""
+    if not isinstance(request, dict):
+        raise InvalidOptionError('Request must be a JSON object', _ERR_INVALID_REQUEST)
+
+    unknown_fields = sorted(set(request) - set(_REQUEST_FIELDS))
+
+    if unknown_fields:
+        raise InvalidOptionError('Unknown request fields: {}'.format(', '.join(unknown_fields)), _ERR_INVALID_REQUEST)
+
+    if not isinstance(request.get('scale', ''), (str, type(None))):
+        raise InvalidOptionError('Scale must be a string', _ERR_INVALID_REQUEST)
+
+    opts = dict(_OPT_DEFAULTS)
+    opts.update(request)
+
+    return types.SimpleNamespace(**opts)
+
+
+def _validate_scale_name(scale_name):
+    if not scale_name:
+        raise UnknownScaleError('A scale must be specified.', _ERR_NO_SCALE_SPECIFIED)
+
+
+def _validate_scale(scale_name, scale):
+    if not scale:
+        raise UnknownScaleError(
+            'Unknown scale: {}{}'.format(scale_name, _format_suggestions(suggest_scale_names(scale_name))),
+            _ERR_UNKNOWN_SCALE)
+
+
+def _validate_length(length):
+    try:
+        length = int(length, 10)
+    except ValueError as e:
+        raise InvalidOptionError('Length must be an integer.', _ERR_LENGTH_NOT_INT) from e
+
+    if length < 1:
+        raise InvalidOptionError('Length must be greater than zero', _ERR_LENGTH_TOO_LOW)
+
+
+def _validate_chunk_size(chunk_size):
+    try:
+        chunk_size = int(chunk_size, 10)
+    except ValueError as e:
+        raise InvalidOptionError('Chunk size must be an integer.', _ERR_CHUNK_SIZE_NOT_INT) from e
+
+    if chunk_size < 1:
+        raise InvalidOptionError('Chunk size must be greater than zero', _ERR_CHUNK_SIZE_TOO_LOW)
+
+
+def _validate_seed(seed):
+    try:
+        int(seed, 10)
+    except ValueError as e:
+        raise InvalidOptionError('Seed must be an integer.', _ERR_SEED_NOT_INT) from e
+
+
+def _validate_count(count, stream):
+    try:
+        count = int(count, 10)
+    except ValueError as e:
+        raise InvalidOptionError('Count must be an integer.', _ERR_COUNT_NOT_INT) from e
+
+    if count < 1:
+        raise InvalidOptionError('Count must be greater than zero', _ERR_COUNT_TOO_LOW)
+
+    if count > 1 and stream:
+        raise InvalidOptionError('Cannot stream when generating more than one riff', _ERR_STREAM_WITH_COUNT)
+
+
+def _validate_model(model_str):
+    if model_str not in _MODELS:
+        raise InvalidOptionError(
+            'Unknown model: {}\nModel must be one of: {}'.format(model_str, ', '.join(_MODELS)), _ERR_UNKNOWN_MODEL)
+
+
+def _validate_max_fret_jump(max_fret_jump_str):
+    try:
+        max_fret_jump = int(max_fret_jump_str)
+    except ValueError as e:
+        raise InvalidOptionError('Max fret jump must be an integer.', _ERR_MAX_FRET_JUMP_NOT_INT) from e
+
+    if max_fret_jump < 0:
+        raise InvalidOptionError('Max fret jump must not be negative', _ERR_MAX_FRET_JUMP_TOO_LOW)
+
+
+def _validate_rng(rng_str):
+    if rng_str not in _RNGS:
+        raise InvalidOptionError(
+            'Unknown random number generator: {}\nRandom number generator must be one of: {}'.format(
+                rng_str, ', '.join(_RNGS)),
+            _ERR_UNKNOWN_RNG)
+
+
+def _validate_start(start_str, rng, model, max_fret_jump):
+    try:
+        start = int(start_str)
+    except ValueError as e:
+        raise InvalidOptionError('Start must be an integer.', _ERR_START_NOT_INT) from e
+
+    if start < 0:
+        raise InvalidOptionError('Start must not be negative', _ERR_START_TOO_LOW)
+
+    if start > 0 and not _is_seekable(rng, model, max_fret_jump):
+        raise InvalidOptionError(
+            'Can only start past the first note with the counter random number generator, and a model that does not '
+            'depend on the note before: uniform or weighted, without a max fret jump',
+            _ERR_CANNOT_SEEK)
+
+
+def _validate_workers(workers_str):
+    try:
+        workers = int(workers_str)
+    except ValueError as e:
+        raise InvalidOptionError('Workers must be an integer.', _ERR_WORKERS_NOT_INT) from e
+
+    if workers < 1:
+        raise InvalidOptionError('Workers must be greater than zero', _ERR_WORKERS_TOO_LOW)
+
+
+def _validate_parallel(stream, rng, model, max_fret_jump):
+    if not stream or not _is_seekable(rng, model, max_fret_jump):
+        raise InvalidOptionError(
+            'Can only generate one riff with more than one worker when streaming with the counter random number '
+            'generator, and a model that does not depend on the note before: uniform or weighted, without a max fret '
+            'jump',
+            _ERR_CANNOT_PARALLELIZE)
+
+
+def _is_seekable(rng, model, max_fret_jump):
+    """Returns whether riffs generated with the given options can be generated from any note without generating the
+    notes before it."""
+    return rng == 'counter' and model != 'markov' and max_fret_jump is None
+
+
+def _validate_rank(rank, radix, length, riff_count):
+    if isinstance(rank, bool):
+        raise InvalidOptionError('Rank must be an integer.', _ERR_RANK_NOT_INT)
+
+    if not isinstance(rank, int):
+        try:
+            rank = int(str(rank).strip())
+        except ValueError as e:
+            raise InvalidOptionError('Rank must be an integer.', _ERR_RANK_NOT_INT) from e
+
+    if rank < 0 or rank >= riff_count:
+        raise InvalidOptionError(
+            'Rank must be at least 0 and below {} ** {}, the number of notes in the scale to the power of the riff '
+            'length'.format(radix, length),
+            _ERR_RANK_OUT_OF_RANGE)
+
+
+def _validate_riff_index(riff_str, riff_count):
+    try:
+        riff = int(riff_str)
+    except ValueError as e:
+        raise InvalidOptionError('Riff must be an integer.', _ERR_RIFF_NOT_INT) from e
+
+    if riff < 0 or riff >= riff_count:
+        raise InvalidOptionError(
+            'Riff must be from 0 to {}, since the corpus has {} riffs'.format(riff_count - 1, riff_count),
+            _ERR_RIFF_OUT_OF_RANGE)
+
+
+def _shred_many_in_scale(scale, length, count, options=_DEFAULT_RIFF_OPTIONS, max_workers=None):
+    with _phase('generation'):
+        tabs = _render_riffs(scale, length, count, options, max_workers)
+
+    with _phase('output'):
+        print('\n\n'.join(tabs))
+
+
+def _shred_in_scale(scale, length, chunk_size=None, rng=None, options=_DEFAULT_RIFF_OPTIONS):
+    """Prints a random riff in the given scale.  When given a chunk size, the riff is printed as a series of tabs of at
+    most that many notes, each generated and flushed before the next, so memory use does not grow with the length.  The
+    notes are the same either way for a given random number generator state."""
+    if chunk_size is None:
+        riff = _generate_riff(scale, length, rng, options)
+
+        with _phase('output'):
+            print(ASCIITab(riff))
+    else:
+        for i, riff in enumerate(_generate_riff_chunks(scale, length, chunk_size, rng, options)):
+            with _phase('output'):
+                print('{}{}'.format('\n' if i else '', ASCIITab(riff)), flush=True)
+
+
+def _shred_in_scale_in_parallel(scale, length, chunk_size, options=_DEFAULT_RIFF_OPTIONS, workers=None):
+    """Prints the tabs _shred_in_scale() prints with a counter generator, rendered in order by worker processes."""
+    import concurrent.futures  # pylint: disable=import-outside-toplevel
+
+    if options.seed is None:
+        options = options._replace(seed=random.getrandbits(64))
+
+    workers = workers or os.cpu_count() or 1
+    chunk_starts = iter(range(0, length, chunk_size))
+    pending = collections.deque()  # futures of the rendered tabs, in the order they must be printed
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        def submit(chunk_start):
+            pending.append(executor.submit(
+                _render_riff_chunk, scale, min(chunk_size, length - chunk_start),
+                options._replace(start=options.start + chunk_start)))
+
+        for chunk_start in itertools.islice(chunk_starts, workers * _TABS_IN_FLIGHT_PER_WORKER):
+            submit(chunk_start)
+
+        first = True
+
+        while pending:
+            tab = pending.popleft().result()
+            chunk_start = next(chunk_starts, None)
+
+            if chunk_start is not None:
+                submit(chunk_start)
+
+            with _phase('output'):
+                print('{}{}'.format('' if first else '\n', tab), flush=True)
+
+            first = False
+
+
+def _render_riff_chunk(scale, length, options):
+    """Generates & renders one tab of a riff in a worker process, returning only the rendered tab."""
+    return str(ASCIITab(_generate_riff(scale, length, CounterRandom(options.seed, options.start), options)))
+
+
+def _generate_riff_chunks(scale, length, chunk_size, rng=None, options=_DEFAULT_RIFF_OPTIONS):
+    """Yields a random riff of the given length in the given scale as consecutive riffs of at most chunk_size notes.
+    Each chunk continues from the last note of the chunk before it."""
+    prev_index = None
+
+    for start in range(0, length, chunk_size):
+        riff = _generate_riff(scale, min(chunk_size, length - start), rng, options, prev_index)
+        prev_index = riff.indices[-1]
+        yield riff
+
+
+def _generate_riff(scale, length, rng=None, options=_DEFAULT_RIFF_OPTIONS, prev_index=None):
+    """Returns a random riff of the given length in the given scale.  The notes are drawn by the given options' model
+    from the given random number generator (e.g. a seeded random.Random), or the global one if none is given.  When the
+    options have a max fret jump, only notes within that many frets of the note before are drawn.  The markov model,
+    and any model with a max fret jump, draws the first note as if it followed the note at prev_index in the scale, when
+    given."""
+    rand = (random if rng is None else rng).random
+    note_model = _get_note_model(scale, options.model, options.max_fret_jump)
+
+    with _phase('generation'):
+        if note_model is None:
+            scale_notes_len = len(scale.notes)
+
+            if isinstance(rng, CounterRandom):
+                values = rng.randoms(length)
+                return Riff(scale, _draw_indices(
+                    length, lambda count: [int(value * scale_notes_len) for value in itertools.islice(values, count)]))
+
+            return Riff(scale, _draw_indices(
+                length, lambda count: [int(rand() * scale_notes_len) for _ in itertools.repeat(None, count)]))
+
+        return Riff(scale, note_model.generate(length, rand, prev_index))
+
+
+def _draw_indices(length, draw_slice):
+    """Returns a bytearray of the given number of scale indices, filled a slice at a time with the list of that many
+    indices that draw_slice() returns."""
+    indices = bytearray(length)
+
+    for start in range(0, length, _DRAW_SLICE_SIZE):
+        stop = min(start + _DRAW_SLICE_SIZE, length)
+        indices[start:stop] = draw_slice(stop - start)
+
+    return indices
+
+
+def _get_note_model(scale, model, max_fret_jump=None):
+    """Returns the cached note model of the given name for the scale & max fret jump, or None for uniform."""
+    if max_fret_jump is not None and max_fret_jump >= _get_fret_span(scale):
+        max_fret_jump = None
+
+    if model == _DEFAULT_MODEL and max_fret_jump is None:
+        return None
+
+    key = (model, scale.name, max_fret_jump)
+    note_model = _note_models.get(key)
+
+    if note_model is not None:
+        _note_models.move_to_end(key)
+    else:
+        with _phase('note_model'):
+            weights = [1.0] * len(scale.notes) if model == _DEFAULT_MODEL else _get_note_weights(scale)
+
+            if model == 'weighted' and max_fret_jump is None:
+                note_model = WeightedNoteModel(weights)
+            else:
+                next_weights = [_get_next_note_weights(scale, weights, prev_i, model, max_fret_jump)
+                                for prev_i in range(len(scale.notes))]
+                note_model = MarkovNoteModel(weights, next_weights)
+
+            _note_models[key] = note_model
+
+            while len(_note_models) > _MAX_CACHED_NOTE_MODELS:
+                _note_models.popitem(last=False)
+
+    return note_model
+
+
+def _get_fret_span(scale):
+    frets = [note.fret for note in scale.notes]
+    return max(frets) - min(frets) if frets else 0
+
+
+def _get_note_weights(scale):
+    """Returns the weight of each note of the scale, favoring its root notes."""
+    key_num = _KEY_NUMS.get(_normalize_name(scale.key))
+    return [_ROOT_NOTE_WEIGHT if _get_key_num_of_note(note) == key_num else 1.0 for note in scale.notes]
+
+
+def _get_next_note_weights(scale, weights, prev_i, model, max_fret_jump=None):
+    """Returns the weight of each note of the scale when following the note at prev_i.  The markov model favors small
+    steps from the note before, and notes more than max_fret_jump frets from the note before have no weight."""
+    prev_note = scale.notes[prev_i]
+    prev_pitch = _get_pitch(prev_note)
+    next_weights = []
+
+    for i, (weight, note) in enumerate(zip(weights, scale.notes)):
+        if max_fret_jump is not None and abs(note.fret - prev_note.fret) > max_fret_jump:
+            weight = 0.0
+        elif model == 'markov':
+            weight *= _REPEATED_NOTE_WEIGHT if i == prev_i else 1 / max(1, abs(_get_pitch(note) - prev_pitch))
+
+        next_weights.append(weight)
+
+    return next_weights
+
+
+def _split_mix(value):
+    """Returns the 64 bit value scrambled by the SplitMix64 finalizer."""
+    value = (value + _SPLITMIX_GAMMA) & _MASK_64
+    value = ((value ^ (value >> 30)) * _SPLITMIX_MULTIPLIER_1) & _MASK_64
+    value = ((value ^ (value >> 27)) * _SPLITMIX_MULTIPLIER_2) & _MASK_64
+    return value ^ (value >> 31)
+
+
+def _get_key_num_of_note(note):
+    return (_get_pitch(note) + _LOW_E_KEY_NUM) % _NOTES_IN_OCTAVE
+
+
+def _get_pitch(note):
+    """Returns the number of semitones from the open low E string to the note."""
+    return _STRING_PITCHES[note.string] + note.fret
+
+
+def _generate_riffs(scale, length, count, options=_DEFAULT_RIFF_OPTIONS, max_workers=None):
+    """Returns a list of random riffs generated in parallel by a pool of worker processes.  Each riff is generated from
+    its own seed, drawn in order from a random number generator seeded with the given options' seed, so the riffs are
+    the same for a given seed no matter how many workers there are."""
+    indices = _map_riffs(_generate_riff_indices, scale, length, _get_seeded_riff_options(options, count), max_workers)
+
+    return [Riff(scale, riff_indices) for riff_indices in indices]
+
+
+def _render_riffs(scale, length, count, options=_DEFAULT_RIFF_OPTIONS, max_workers=None):
+    """Returns the tabs of the riffs that _generate_riffs() generates.  Each tab is rendered by the worker process that
+    generated its riff, since rendering takes longer than generating."""
+    return _map_riffs(_render_riff, scale, length, _get_seeded_riff_options(options, count), max_workers)
+
+
+def _get_seeded_riff_options(options, count):
+    """Returns the given number of copies of the given RiffOptions, each with its own seed drawn from a random number
+    generator seeded with the options' seed."""
+    seed_rng = random.Random(options.seed)
+    return [options._replace(seed=seed_rng.getrandbits(64)) for _ in range(count)]
+
+
+def _map_riffs(func, scale, length, riff_options, max_workers):
+    """Returns the results, in order, of calling func in a pool of worker processes with each given RiffOptions."""
+    import concurrent.futures  # pylint: disable=import-outside-toplevel
+
+    count = len(riff_options)
+    max_workers = max_workers or os.cpu_count() or 1
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        return list(executor.map(
+            func,
+            itertools.repeat(scale, count),
+            itertools.repeat(length, count),
+            riff_options,
+            chunksize=max(1, count // (max_workers * 4))))
+
+
+def _generate_riff_indices(scale, length, options):
+    """Generates a riff in a worker process, returning only its indices so that the scale is not sent back."""
+    return _generate_riff(scale, length, _get_rng(options), options).indices
+
+
+def _render_riff(scale, length, options):
+    """Generates & renders a riff in a worker process, returning only the rendered tab."""
+    return str(ASCIITab(_generate_riff(scale, length, _get_rng(options), options)))
+
+
+def _get_scale_by_name(name):
+    registry = _get_scale_registry()
+
+    with _phase('scale_lookup'):
+        return registry.get_scale_by_name(name)
+
+
+def _get_tuned_scale(scale, tuning_key):
+    offset = _get_key_offset(tuning_key)
+    adjusted_scale = scale
+
+    if offset != 0:
+        registry = _get_scale_registry()
+
+        with _phase('tuning'):
+            adjusted_scale = registry.get_transposed_scale(scale, offset)
+
+        if adjusted_scale is None:
+            raise UnknownScaleError(
+                'Could not find other scales of same type as this:\n{}'.format(scale),
+                _ERR_CANT_FIND_SCALES_OF_TYPE
+            )
+
+    return adjusted_scale
+
+
+def _get_all_scales():
+    return _get_scale_registry().get_scales()
+
+
+def _get_scale_registry():
+    global _scale_registry  # pylint: disable=global-statement
+
+    if _scale_registry is None:
+        with _phase('catalog'):
+            _scale_registry = ScaleRegistry(_get_scale_families())
+
+    return _scale_registry
+
+
+def _get_scale_families():
+    return [_get_major_pentatonic_family()] + [
+        FormulaScaleFamily(names, intervals) for names, intervals in _SCALE_FORMULAS
+    ]
+
+
+def _get_major_pentatonic_family():
+    return ShapeScaleFamily(['Major Pentatonic', 'Maj Pen'], [
+        Note('E', 5), Note('E', 6), Note('E', 8),
+        Note('A', 5), Note('A', 7), Note('A', 8),
+        Note('D', 5), Note('D', 7), Note('D', 8),
+        Note('G', 5), Note('G', 7),
+        Note('B', 5), Note('B', 6), Note('B', 8),
+        Note('e', 5), Note('e', 6), Note('e', 8),
+    ], MajorPentatonicScale)
+
+
+def _get_key_offset(tuning_key, orig_key='A'):
+    offset = _KEY_OFFSETS.get((_normalize_name(tuning_key), _normalize_name(orig_key)))
+
+    if offset is None:
+        # At least one of the keys is unknown.  Let _get_key_num() raise the appropriate error.
+        offset = _get_key_num(tuning_key) - _get_key_num(orig_key)
+
+    return offset
+
+
+def _get_key_num(key):
+    key_num = _KEY_NUMS.get(_normalize_name(key))
+
+    if key_num is None:
+        raise InvalidKeyError(
+            'Invalid key: {}{}\nKey must be one of: {}'.format(
+                key,
+                _format_suggestions(suggest_keys(key)),
+                ', '.join([k for keys in _KEYS for k in keys])
+            ), _ERR_INVALID_KEY)
+
+    return key_num
+
+
+def _get_scale_name_index():
+    global _scale_name_index  # pylint: disable=global-statement
+
+    if _scale_name_index is None:
+        registry = _get_scale_registry()
+
+        with _phase('name_index'):
+            _scale_name_index = NameIndex(registry.get_names())
+
+    return _scale_name_index
+
+
+def _get_key_name_index():
+    global _key_name_index  # pylint: disable=global-statement
+
+    if _key_name_index is None:
+        with _phase('name_index'):
+            _key_name_index = NameIndex([key for keys in _KEYS for key in keys])
+
+    return _key_name_index
+
+
+def _format_suggestions(suggestions):
+    return '\nDid you mean: {}?'.format(', '.join(suggestions)) if suggestions else ''
+
+
+def _strip_common_affixes(str1, str2):
+    """Returns the strings without the characters that they both start or end with."""
+    max_len = min(len(str1), len(str2))
+    prefix_len = 0
+    suffix_len = 0
+
+    while prefix_len < max_len and str1[prefix_len] == str2[prefix_len]:
+        prefix_len += 1
+
+    while suffix_len < max_len - prefix_len and str1[-1 - suffix_len] == str2[-1 - suffix_len]:
+        suffix_len += 1
+
+    return str1[prefix_len:len(str1) - suffix_len], str2[prefix_len:len(str2) - suffix_len]
+
+
+def _get_char_bits(string):
+    """Returns a dict of each character of the string to an int with the bits of its positions in the string set."""
+    char_bits = dict()
+
+    for i, char in enumerate(string):
+        char_bits[char] = char_bits.get(char, 0) | 1 << i
+
+    return char_bits
+
+
+def _get_edit_distance(str1, str2, max_distance=None):
+    """Returns the Levenshtein distance between the strings: the fewest single character insertions, deletions, and
+    substitutions that turn one into the other.  When given a max distance, stops early and returns max_distance + 1
+    as soon as the distance is known to be greater than the max distance."""
+    if max_distance is not None and abs(len(str1) - len(str2)) > max_distance:
+        return max_distance + 1
+
+    # Characters that both strings start or end with never need editing, so only the rest of each is compared
+    str1, str2 = _strip_common_affixes(str1, str2)
+
+    if not str1:
+        return len(str2) if max_distance is None else min(len(str2), max_distance + 1)
+
+    # Myers' bit-parallel algorithm: bit i of pos & neg is whether the distance between the first i + 1 characters of
+    # str1 and the characters of str2 so far is one more or one less than for the first i characters, so each column of
+    # the usual table of distances is computed from the one before with a few integer operations
+    char_bits = _get_char_bits(str1)
+    mask = (1 << len(str1)) - 1
+    last_bit = 1 << (len(str1) - 1)
+    pos, neg, distance = mask, 0, len(str1)
+
+    for j, char in enumerate(str2, 1):
+        matches = char_bits.get(char, 0)
+        horizontal = (((matches & pos) + pos) ^ pos) | matches
+        horizontal_pos = neg | ~(horizontal | pos) & mask
+        horizontal_neg = pos & horizontal
+
+        if horizontal_pos & last_bit:
+            distance += 1
+        elif horizontal_neg & last_bit:
+            distance -= 1
+
+        # Each column left to compute changes the distance by at most one
+        if max_distance is not None and distance - (len(str2) - j) > max_distance:
+            return max_distance + 1
+
+        horizontal_pos = (horizontal_pos << 1 | 1) & mask
+        horizontal_neg = (horizontal_neg << 1) & mask
+        pos = horizontal_neg | ~(matches | neg | horizontal_pos) & mask
+        neg = horizontal_pos & (matches | neg)
+
+    return distance if max_distance is None else min(distance, max_distance + 1)
+
+
+def _normalize_name(name):
+    return ''.join(str(name).split()).lower()
+
+
+def _basename():
+    return os.path.basename(sys.argv[0])
+
+
+def _print_err_and_usage(err):
+    """Prints the error, followed by the commands that may help with it.  Only the command line prints these, since they
+    are no help to library users or server clients."""
+    basename = _basename()
+    hints = ''
+
+    if err.err_code == _ERR_UNKNOWN_SCALE:
+        hints = (
+            '\nTo see all supported scale names, execute: {0} --all-scale-names'
+            '\nTo see all supported scales, execute: {0} --all-scales').format(basename)
+
+    print('{}{}\nFor usage, execute: {} -h'.format(err, hints, basename), file=sys.stderr)
+
+
+def _join_multiline_strings(str1, str2, sep='  '):  # TODO unit test
+    lines_1 = str(str1 or '').splitlines()
+    lines_2 = str(str2 or '').splitlines()
+    line_count_1 = len(lines_1)
+    line_count_2 = len(lines_2)
+    max_line_length_1 = len(max(lines_1, key=len) if lines_1 else '')
+    lines = []
+
+    for x in range(0, max(line_count_1, line_count_2)):
+        line = ''
+
+        if x < line_count_1:
+            line += lines_1[x].ljust(max_line_length_1, ' ')
+        else:
+            line += ''.ljust(max_line_length_1, ' ')
+
+        line += sep if sep else ''
+
+        if x < line_count_2:
+            line += lines_2[x]
+
+        lines.append(line)
+
+    return '\n'.join(lines)
+
+
+class Note:
+    """A fret on a string.  Notes are immutable and interned, so there is only ever one instance for each string & fret
+    and notes can be compared and hashed by identity."""
+
+    # The slots are set with object.__setattr__() in __new__(), since __setattr__() refuses, so pylint cannot see them
+    # pylint: disable=no-member
+    __slots__ = ('string', 'fret')
+    _instances = dict()
+
+    def __new__(cls, string, fret):
+        note = cls._instances.get((string, fret))
+
+        if note is None:
+            note = super().__new__(cls)
+            object.__setattr__(note, 'string', string)
+            object.__setattr__(note, 'fret', fret)
+            note = cls._instances.setdefault((string, fret), note)
+
+        return note
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Notes are immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('Notes are immutable')
+
+    def __reduce__(self):
+        return Note, (self.string, self.fret)
+
+    def __str__(self):
+        return self.string + str(self.fret)
+
+    def offset(self, offset, wrap=True):
+        offset_fret = self.fret + offset
+
+        if wrap:
+            offset_fret %= _NOTES_IN_OCTAVE
+
+        return Note(self.string, offset_fret)
+
+
+class Scale:
+    def __init__(self, name, key, aliases, notes, family=None):
+        self.name = name
+        self.key = key
+        self.aliases = tuple(aliases)
+        self.notes = tuple(notes)
+        self.family = family
+
+    def __str__(self):
+        return '{} {{{}}}'.format(self.name, ', '.join(str(n) for n in self.notes))
+
+
+class MajorPentatonicScale(Scale):
+    def __init__(self, key, notes, family=None):
+        super().__init__(
+            name='{} Major Pentatonic'.format(key),
+            key=key,
+            aliases=self._get_aliases_for_key(key),
+            notes=notes,
+            family=family
+        )
+
+    @staticmethod
+    def _get_aliases_for_key(key):
+        return [
+            '{} Major Pentatonic'.format(key),
+            '{}MajorPentatonic'.format(key),
+            '{} Maj Pen'.format(key),
+            '{}MajPen'.format(key),
+        ]
+
+
+class Riff:
+    """Notes from a scale, stored compactly as one byte per note: the index of that note in the scale's notes."""
+
+    def __init__(self, scale, indices):
+        if len(scale.notes) > 256:
+            raise ValueError('Riffs can only be made from scales with at most 256 notes')
+
+        self.scale = scale
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        notes = self.scale.notes
+        return (notes[i] for i in self.indices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Riff(self.scale, self.indices[index])
+
+        return self.scale.notes[self.indices[index]]
+
+
+class RiffCorpus:
+    """A corpus file written by write_corpus(), memory-mapped so that any riff can be read without the others."""
+
+    def __init__(self, path):
+        import mmap  # pylint: disable=import-outside-toplevel
+        import struct  # pylint: disable=import-outside-toplevel
+
+        header_size = struct.calcsize(_CORPUS_HEADER_FORMAT)
+        self._offset_size = struct.calcsize(_CORPUS_OFFSET_FORMAT)
+        self._riff_offsets = struct.Struct(_CORPUS_RIFF_OFFSETS_FORMAT)
+
+        try:
+            with open(path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise InvalidCorpusError('Cannot read corpus {}: {}'.format(path, e), _ERR_INVALID_CORPUS) from e
+
+        try:
+            magic, version, scale_name_len, self._riff_count = struct.unpack_from(_CORPUS_HEADER_FORMAT, self._mmap)
+        except struct.error:
+            magic, version = None, None
+
+        if magic != _CORPUS_MAGIC or version != _CORPUS_VERSION:
+            self._raise_invalid('Not a version {} corpus: {}'.format(_CORPUS_VERSION, path))
+
+        self._path = path
+        self._offsets_start = header_size + scale_name_len
+        offsets_end = self._offsets_start + self._offset_size * (self._riff_count + 1)
+
+        if offsets_end > len(self._mmap):
+            self._raise_invalid('Corpus is truncated: {}'.format(path))
+
+        notes_end, = struct.unpack_from(_CORPUS_OFFSET_FORMAT, self._mmap, offsets_end - self._offset_size)
+
+        if notes_end != len(self._mmap):
+            self._raise_invalid(
+                'Corpus is {} bytes long, but should be {}: {}'.format(len(self._mmap), notes_end, path))
+
+        try:
+            scale_name = self._mmap[header_size:self._offsets_start].decode('utf-8')
+            self.scale = get_scale(scale_name) if self._riff_count else None
+        except (UnicodeDecodeError, ExitCodeError) as e:
+            self._raise_invalid('Corpus has an unknown scale: {}'.format(path), e)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._riff_count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._riff_count
+
+        if index < 0 or index >= self._riff_count:
+            raise IndexError('Corpus riff index out of range')
+
+        start, end = self._riff_offsets.unpack_from(self._mmap, self._offsets_start + index * self._offset_size)
+
+        if not start <= end <= len(self._mmap):
+            raise InvalidCorpusError(
+                'Corpus riff {} is from byte {} to {}, outside of the file: {}'.format(index, start, end, self._path),
+                _ERR_INVALID_CORPUS)
+
+        indices = self._mmap[start:end]
+
+        if indices and max(indices) >= len(self.scale.notes):
+            raise InvalidCorpusError(
+                'Corpus riff {} has notes that are not in {}: {}'.format(index, self.scale.name, self._path),
+                _ERR_INVALID_CORPUS)
+
+        return Riff(self.scale, indices)
+
+    def close(self):
+        self._mmap.close()
+
+    def _raise_invalid(self, message, cause=None):
+        self.close()
+        raise InvalidCorpusError(message, _ERR_INVALID_CORPUS) from cause
+
+
+class AliasTable:
+    """Draws indices at random, each as likely as its weight, in the same constant time no matter how many weights
+    there are.  Uses Walker's alias method: every index owns an equal share of the range [0, 1), and hands the part of
+    its share that its weight does not need to one other index, its alias."""
+
+    __slots__ = ('_probs', '_aliases')
+
+    def __init__(self, weights):
+        weights_len = len(weights)
+        total = sum(weights)
+
+        if not weights_len or total <= 0:
+            raise ValueError('Alias tables need at least one positive weight')
+
+        scaled = [weight * weights_len / total for weight in weights]
+        small = [i for i, weight in enumerate(scaled) if weight < 1]
+        large = [i for i, weight in enumerate(scaled) if weight >= 1]
+        self._probs = [1.0] * weights_len
+        self._aliases = list(range(weights_len))
+
+        while small and large:
+            i = small.pop()
+            alias = large.pop()
+            self._probs[i] = scaled[i]
+            self._aliases[i] = alias
+            scaled[alias] -= 1 - scaled[i]
+            (small if scaled[alias] < 1 else large).append(alias)
+
+    def __len__(self):
+        return len(self._probs)
+
+    def draw(self, rand):
+        """Returns an index drawn with the given random function, e.g. random.random."""
+        share = rand() * len(self._probs)
+        i = int(share)
+        return i if share - i < self._probs[i] else self._aliases[i]
+
+
+class CounterRandom:
+    """A random number generator whose Nth number is computed from the seed and N alone, by mixing them with SplitMix64.
+    Any number can be computed without computing the ones before it, so a riff can be generated from any note, and
+    parts of a riff can be generated separately and still match the whole.  Seeds are used modulo 2 ** 64."""
+
+    __slots__ = ('_key', 'index')
+
+    def __init__(self, seed=None, index=0):
+        self._key = _split_mix((random.getrandbits(64) if seed is None else seed) & _MASK_64)
+        self.index = index
+
+    def random(self):
+        """Returns the next random float in [0, 1), the same one that random_at() returns for the current index."""
+        value = self.random_at(self.index)
+        self.index += 1
+        return value
+
+    def random_at(self, index):
+        """Returns the random float in [0, 1) at the given index."""
+        return (_split_mix((self._key + index * _SPLITMIX_GAMMA) & _MASK_64) >> 11) * _FLOAT_SCALE
+
+    def randoms(self, count):
+        """Yields the next count random floats.  The same as calling random() count times, but faster."""
+        start = self._key + (self.index + 1) * _SPLITMIX_GAMMA
+        self.index += count
+
+        for value in range(start, start + count * _SPLITMIX_GAMMA, _SPLITMIX_GAMMA):
+            value &= _MASK_64
+            value = ((value ^ (value >> 30)) * _SPLITMIX_MULTIPLIER_1) & _MASK_64
+            value = ((value ^ (value >> 27)) * _SPLITMIX_MULTIPLIER_2) & _MASK_64
+            yield ((value ^ (value >> 31)) >> 11) * _FLOAT_SCALE
+
+
+class WeightedNoteModel:
+    """Draws each note of a riff on its own, each as likely as its weight."""
+
+    def __init__(self, weights):
+        self._table = AliasTable(weights)
+
+    def generate(self, length, rand, prev_index=None):  # pylint: disable=unused-argument
+        """Returns the scale indices of the given number of notes, drawn with the given random function."""
+        draw = self._table.draw
+        return _draw_indices(length, lambda count: [draw(rand) for _ in itertools.repeat(None, count)])
+
+
+class MarkovNoteModel:
+    """Draws each note of a riff based on the note before it: the first note by the first weights, and each note after
+    by the next weights of the note before it.  The table for every note that can come before is built up front, so
+    each draw takes constant time."""
+
+    def __init__(self, first_weights, next_weights):
+        self._first_table = AliasTable(first_weights)
+        self._next_tables = [AliasTable(weights) for weights in next_weights]
+
+    def generate(self, length, rand, prev_index=None):
+        """Returns the scale indices of the given number of notes, drawn with the given random function.  The first note
+        follows the note at prev_index in the scale, when given."""
+        indices = bytearray(length)
+        draws = [table.draw for table in self._next_tables]
+        draw = self._first_table.draw if prev_index is None else draws[prev_index]
+
+        for i in range(length):
+            prev_index = indices[i] = draw(rand)
+            draw = draws[prev_index]
+
+        return indices
+
+
+class ScaleFamily(abc.ABC):
+    """A type of scale (e.g. Blues), which can build its scale in any key.  The first name is the name of the family's
+    scales, and each name is also an alias of them.  Subclasses give the notes of the scale in each key."""
+
+    def __init__(self, names, scale_class=None):
+        self.name = names[0]
+        self.names = tuple(names)
+        self._scale_class = scale_class
+
+    def get_aliases(self, key):
+        """Returns the aliases of the family's scale in the given key, e.g. "A Min Pen" & "AMinPen"."""
+        return [
+            alias
+            for name in self.names
+            for alias in ['{} {}'.format(key, name), '{}{}'.format(key, ''.join(name.split()))]
+        ]
+
+    def build_scale(self, key_num):
+        key = _KEYS[key_num][0]
+        notes = self.get_notes(key_num)
+
+        if self._scale_class is not None:
+            return self._scale_class(key, notes, family=self)
+
+        return Scale('{} {}'.format(key, self.name), key, self.get_aliases(key), notes, family=self)
+
+    @abc.abstractmethod
+    def get_notes(self, key_num):
+        """Returns the notes of the family's scale in the key with the given number."""
+
+
+class ShapeScaleFamily(ScaleFamily):
+    """A family whose scales are all one shape on the fretboard, given in the key of A and slid up the neck to each
+    other key.  Shapes that would start at or past the 12th fret are played an octave lower instead."""
+
+    def __init__(self, names, shape, scale_class=None):
+        super().__init__(names, scale_class)
+        self._shape = tuple(shape)
+        self._lowest_fret = min(note.fret for note in self._shape)
+
+    def get_notes(self, key_num):
+        offset = key_num
+
+        if self._lowest_fret + offset >= _NOTES_IN_OCTAVE:
+            offset -= _NOTES_IN_OCTAVE
+
+        return [note.offset(offset, wrap=False) for note in self._shape]
+
+
+class FormulaScaleFamily(ScaleFamily):
+    """A family whose scales are built from a formula: the semitones above the root of each of the scale's notes.  Each
+    scale is played in the position around its root on the low E string, from the lowest string to the highest, and
+    each note must be higher than the notes before it so that no pitch is repeated on two strings."""
+
+    def __init__(self, names, intervals):
+        super().__init__(names)
+        self.intervals = tuple(intervals)
+
+    def get_notes(self, key_num):
+        key_nums = set((key_num + interval) % _NOTES_IN_OCTAVE for interval in self.intervals)
+        root_fret = (key_num - _LOW_E_KEY_NUM) % _NOTES_IN_OCTAVE
+        low_fret = max(root_fret + _POSITION_LOW_FRET_OFFSET, 0)
+        frets = range(low_fret, low_fret + _POSITION_HIGH_FRET_OFFSET - _POSITION_LOW_FRET_OFFSET + 1)
+        notes = []
+        highest_pitch = -1
+
+        for string in sorted(_STRING_PITCHES, key=_STRING_PITCHES.get):
+            for fret in frets:
+                note = Note(string, fret)
+                pitch = _get_pitch(note)
+
+                if pitch > highest_pitch and _get_key_num_of_note(note) in key_nums:
+                    notes.append(note)
+                    highest_pitch = pitch
+
+        return notes
+
+
+class ScaleRegistry:
+    """Every known family of scales, in every key, building & caching each scale when it is first asked for."""
+
+    def __init__(self, families, max_cached_scales=_MAX_CACHED_SCALES):
+        self.families = tuple(families)
+        self._families_by_name = dict()  # normalized family name -> family
+        self._scales = collections.OrderedDict()  # (family, key number) -> scale, least recently used first
+        self._max_cached_scales = max_cached_scales
+
+        for family in reversed(self.families):  # reversed so that the first family with a name wins
+            for name in family.names:
+                self._families_by_name[_normalize_name(name)] = family
+
+    def get_scale(self, family, key_num):
+        """Returns the family's scale in the key with the given number, building it if it is not cached."""
+        cache_key = (family, key_num % _NOTES_IN_OCTAVE)
+        scale = self._scales.get(cache_key)
+
+        if scale is None:
+            scale = family.build_scale(cache_key[1])
+            self._scales[cache_key] = scale
+
+            if len(self._scales) > self._max_cached_scales:
+                self._scales.popitem(last=False)
+        else:
+            self._scales.move_to_end(cache_key)
+
+        return scale
+
+    def get_scales(self):
+        """Yields the scale of every family in every key, building each as it is needed."""
+        for family in self.families:
+            for key_num in range(_NOTES_IN_OCTAVE):
+                yield self.get_scale(family, key_num)
+
+    def get_names(self):
+        """Returns every name that a scale can be looked up by, including each spelling of its key, without building
+        any scales."""
+        return [
+            key_name + alias[len(key_names[0]):]
+            for family in self.families
+            for key_names in _KEYS
+            for alias in family.get_aliases(key_names[0])
+            for key_name in key_names
+        ]
+
+    def get_scale_by_name(self, name):
+        normalized_name = _normalize_name(name)
+
+        # The key may be spelled with any number of characters (e.g. "A", "Bb", "A Sharp"), so try each split of the
+        # name into a key & a family name
+        for key_length in range(min(len(normalized_name), _MAX_KEY_NAME_LENGTH), 0, -1):
+            key_num = _KEY_NUMS.get(normalized_name[:key_length])
+            family = self._families_by_name.get(normalized_name[key_length:])
+
+            if key_num is not None and family is not None:
+                return self.get_scale(family, key_num)
+
+        return None
+
+    def get_transposed_scale(self, scale, offset):
+        """Returns the scale of the same family whose key is offset from the given scale's key by the given number of
+        semitones, or None if the given scale's family is not in this registry."""
+        if scale.family not in self.families:
+            return None
+
+        return self.get_scale(scale.family, _KEY_NUMS[_normalize_name(scale.key)] + offset)
+
+
+class NameIndex:
+    """Completes & suggests names, ignoring case & whitespace.  Completions are found by walking a prefix trie.
+    Suggestions are found by comparing the name with every name, or once index_suggestions() has been called, by
+    looking up the strings left by deleting up to a few characters from the name."""
+
+    def __init__(self, names):
+        self._names = dict()  # normalized name -> the first name given with that normalized name
+
+        for name in names:
+            self._names.setdefault(_normalize_name(name), name)
+
+        self._trie = dict()  # character -> child node, and None -> the normalized name that ends at the node
+        self._deletions = None  # string -> the normalized names it is left by deleting up to a few characters from
+        self._max_name_length = max((len(normalized_name) for normalized_name in self._names), default=0)
+
+        for normalized_name in self._names:
+            node = self._trie
+
+            for char in normalized_name:
+                node = node.setdefault(char, dict())
+
+            node[None] = normalized_name
+
+    def index_suggestions(self):
+        """Indexes the names so that suggest() only compares the name with the few names that might be close to it.
+        Indexing takes as long as many suggestions without it."""
+        if self._deletions is None:
+            self._deletions = dict()
+
+            for normalized_name in self._names:
+                for deletion in _get_deletions(normalized_name, _MAX_SUGGESTION_DISTANCE):
+                    self._deletions.setdefault(deletion, []).append(normalized_name)
+
+    def complete(self, prefix, limit=_MAX_SUGGESTIONS):
+        """Returns up to the given number of names that start with the prefix, in alphabetical order."""
+        node = self._trie
+
+        for char in _normalize_name(prefix):
+            node = node.get(char)
+
+            if node is None:
+                return []
+
+        completions = []
+        stack = [node]
+
+        while stack and len(completions) < limit:
+            node = stack.pop()
+
+            if None in node:
+                completions.append(self._names[node[None]])
+
+            stack.extend(node[char] for char in sorted((char for char in node if char is not None), reverse=True))
+
+        return completions
+
+    def suggest(self, name, limit=_MAX_SUGGESTIONS):
+        """Returns up to the given number of the names within a few edits of the given name that are closest to it, in
+        alphabetical order.  Shorter names must be closer to be suggested."""
+        normalized_name = _normalize_name(name)
+        max_distance = min(_MAX_SUGGESTION_DISTANCE, len(normalized_name) // 3 + 1)
+
+        if len(normalized_name) > self._max_name_length + max_distance:
+            return []
+
+        if self._deletions is None:
+            candidates = self._names
+        else:
+            # Any name within max_distance edits of the name leaves a string that the name also leaves when up to
+            # max_distance characters are deleted from each
+            candidates = set()
+
+            for deletion in _get_deletions(normalized_name, max_distance):
+                candidates.update(self._deletions.get(deletion, ()))
+
+        matches = []
+
+        for candidate in candidates:
+            distance = _get_edit_distance(normalized_name, candidate, max_distance)
+
+            if distance <= max_distance:
+                matches.append((distance, candidate))
+
+        matches.sort()
+        closest = [match_name for distance, match_name in matches if distance == matches[0][0]]
+
+        return [self._names[match_name] for match_name in closest[:limit]]
+
+
+def _get_deletions(string, max_deletions):
+    """Returns the set of strings left by deleting up to the given number of characters from the string, including the
+    string itself."""
+    strings = {string}
+    deletions = set(strings)
+
+    for _ in range(max_deletions):
+        strings = {deleted[:i] + deleted[i + 1:] for deleted in strings for i in range(len(deleted))}
+        deletions |= strings
+
+    return deletions
+
+
+class ASCIITab:
+    _STRINGS = ('e', 'B', 'G', 'D', 'A', 'E')
+    _columns = dict()  # note -> the note's cell on each string
+
+    def __init__(self, notes):
+        self.notes = notes
+
+    def __str__(self):
+        with _phase('rendering'):
+            keys, columns = self._get_keys_and_columns()
+            lines = []
+
+            for i, string in enumerate(self._STRINGS):
+                cells = {key: column[i] for key, column in columns.items()}
+                lines.append('{}|-{}-'.format(string, '--'.join(map(cells.__getitem__, keys))))
+
+            return '\n'.join(lines)
+
+    def _get_keys_and_columns(self):
+        """Returns a key for each note in the tab, and the column of each distinct note by key.  Riffs are keyed by the
+        notes' indices in the scale so they can be rendered without looking up each note."""
+        if isinstance(self.notes, Riff):
+            return self.notes.indices, {i: self._get_column(note) for i, note in enumerate(self.notes.scale.notes)}
+
+        notes = list(self.notes)
+        return notes, {note: self._get_column(note) for note in dict.fromkeys(notes)}
+
+    @classmethod
+    def _get_column(cls, note):
+        column = cls._columns.get(note)
+
+        if column is None:
+            placeholder = '-' if note.fret < 10 else '--'
+            column = tuple(str(note.fret) if string == note.string else placeholder for string in cls._STRINGS)
+            cls._columns[note] = column
+
+        return column
+
+
+class Profiler:
+    """Records the wall time, number of calls, and change in the number of allocated memory blocks of each phase of a
+    run.  Time spent in a phase that is nested in another phase only counts toward the nested phase."""
+
+    def __init__(self, start, cprofile=False):
+        """The given start time & allocated block count are recorded as the parse_opts phase."""
+        self.phases = dict()
+        self._start_time = start[0]
+        self._stack = []  # [name, start time, start allocated block count] of each phase being recorded
+        self._cprofile = None
+
+        self._record('parse_opts', start[0], start[1])
+
+        if cprofile:
+            import cProfile  # pylint: disable=import-outside-toplevel
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def start(self, name):
+        now, blocks = time.perf_counter(), sys.getallocatedblocks()
+
+        if self._stack:
+            self._pause(self._stack[-1], now, blocks)
+
+        self._stack.append([name, now, blocks])
+
+    def stop(self):
+        name, start_time, start_blocks = self._stack.pop()
+        self._record(name, start_time, start_blocks)
+
+        if self._stack:
+            self._stack[-1][1:] = [time.perf_counter(), sys.getallocatedblocks()]
+
+    def stop_all(self):
+        """Stops recording every phase and the cProfile profiler, and returns the report."""
+        while self._stack:
+            self.stop()
+
+        if self._cprofile is not None:
+            self._cprofile.disable()
+
+        return {
+            'total_seconds': time.perf_counter() - self._start_time,
+            'phases': self.phases,
+        }
+
+    def dump_cprofile_stats(self, path):
+        self._cprofile.dump_stats(path)
+
+    def _pause(self, frame, now, blocks):
+        name, start_time, start_blocks = frame
+        self._add(name, now - start_time, blocks - start_blocks, 0)
+
+    def _record(self, name, start_time, start_blocks):
+        self._add(name, time.perf_counter() - start_time, sys.getallocatedblocks() - start_blocks, 1)
+
+    def _add(self, name, seconds, allocated_blocks, calls):
+        phase = self.phases.setdefault(name, {'seconds': 0.0, 'allocated_blocks': 0, 'calls': 0})
+        phase['seconds'] += seconds
+        phase['allocated_blocks'] += allocated_blocks
+        phase['calls'] += calls
+
+
+class ProfilerPhase:
+    """Records the code it wraps as a phase of the given profiler.  Does nothing when there is no profiler."""
+
+    __slots__ = ('profiler', 'name')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        if self.profiler is not None:
+            self.profiler.start(self.name)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.profiler is not None:
+            self.profiler.stop()
+
+
+class ExitCodeError(Exception):
+    def __init__(self, message, err_code):
+        super().__init__(message)
+        self.err_code = err_code
+
+
+class UnknownScaleError(ExitCodeError):
+    pass
+
+
+class InvalidKeyError(ExitCodeError):
+    pass
+
+
+class InvalidOptionError(ExitCodeError):
+    pass
+
+
+class InvalidCorpusError(ExitCodeError):
+    pass
 
 
 if __name__ == '__main__':
@@ -2,12 +2,25 @@
 
 
 import argparse
+import asyncio
 import builtins
+import concurrent.futures
+import gc
+import io
+import json
 import os.path
+import pickle
 import random
+import struct
+import subprocess
 import sys
+import tempfile
+import time
 
-from expects import be, be_empty, be_none, expect, equal, raise_error
+from expects import (
+    be, be_a, be_above, be_above_or_equal, be_below, be_empty, be_none, contain, expect, equal,
+    have_key, have_len, raise_error
+)
 from mamba import after, before, description, it
 from mockito import mock, unstub, when, verify
 from mockito.matchers import arg_that
@@ -18,12 +31,26 @@ with description(shredgen) as self:
     with after.each:
         unstub()
 
+    with description('import'):
+        with it('does not import the modules that only some actions need'):
+            modules = subprocess.check_output(
+                [sys.executable, '-c', 'import sys, shredgen; print("\\n".join(sys.modules))'],
+                cwd=os.path.dirname(os.path.abspath(shredgen.__file__)),
+                universal_newlines=True
+            ).split()
+
+            for module in ['argparse', 'asyncio', 'concurrent.futures', 'hashlib', 'json', 'mmap', 'struct',
+                           'tempfile']:
+                expect(modules).not_to(contain(module))
+
     with description(shredgen.main):
         with before.each:
             self.opts = mock({})
             when(shredgen)._parse_opts(...).thenReturn(self.opts)
             when(shredgen)._update_default_opts(...)
+            when(shredgen)._start_profiling(...)
             when(shredgen)._perform_user_action(...)
+            when(shredgen)._stop_profiling(...)
             when(shredgen)._print_err_and_usage(...)
             when(sys).exit(...)
 
@@ -54,16 +81,252 @@ with description(shredgen) as self:
             shredgen.main()
             verify(sys).exit(0)
 
+        with it('starts profiling before performing the user action'):
+            shredgen.main()
+            verify(shredgen)._start_profiling(self.opts, ...)
+
+        with it('stops profiling even when there is an error'):
+            when(shredgen)._perform_user_action(...).thenRaise(shredgen.ExitCodeError('foo', 7))
+            shredgen.main()
+            verify(shredgen)._stop_profiling(self.opts)
+
+    with description(shredgen.get_scale):
+        with it('returns the scale with the given alias'):
+            expect(shredgen.get_scale(' C Maj Pen ').name).to(equal('C Major Pentatonic'))
+
+        with it('returns scales of every family'):
+            expect(shredgen.get_scale('Bb Harm Min').name).to(equal('A# Harmonic Minor'))
+            expect(shredgen.get_scale('E minor').name).to(equal('E Aeolian'))
+
+        with it('raises an UnknownScaleError when there is no such scale'):
+            expect(lambda: shredgen.get_scale('nope')).to(raise_error(shredgen.UnknownScaleError))
+
+        with it('raises an UnknownScaleError when no scale is given'):
+            expect(lambda: shredgen.get_scale(None)).to(raise_error(shredgen.UnknownScaleError))
+
+    with description(shredgen.complete_scale_name):
+        with it('returns the scale names that start with the prefix'):
+            expect(shredgen.complete_scale_name('c ma')).to(
+                equal(['C Maj', 'C Major', 'C Major Pentatonic', 'C Maj Pen']))
+
+        with it('returns at most the given number of names'):
+            expect(shredgen.complete_scale_name('a', 3)).to(have_len(3))
+
+    with description(shredgen.suggest_scale_names):
+        with it('returns the scale names spelled most like the given name'):
+            expect(shredgen.suggest_scale_names('Cmajorpentatonik')).to(equal(['C Major Pentatonic']))
+
+    with description(shredgen.complete_key):
+        with it('returns the key names that start with the prefix'):
+            expect(shredgen.complete_key('b')).to(equal(['B', 'Bb', 'B Flat']))
+
+    with description(shredgen.suggest_keys):
+        with it('returns the key names spelled most like the given key'):
+            expect(shredgen.suggest_keys('Dflt')).to(equal(['D Flat']))
+
+    with description(shredgen.tune_scale):
+        with it('transposes a scale name to the tuning key'):
+            expect(shredgen.tune_scale('A maj pen', 'C').name).to(equal('C Major Pentatonic'))
+
+        with it('transposes a scale to the tuning key'):
+            scale = shredgen.get_scale('A maj pen')
+            expect(shredgen.tune_scale(scale, 'C').name).to(equal('C Major Pentatonic'))
+
+        with it('transposes scales of every family'):
+            expect(shredgen.tune_scale('A Blues', 'C').name).to(equal('C Blues'))
+            expect(shredgen.tune_scale('A Mixolydian', 'Eb').name).to(equal('D# Mixolydian'))
+
+        with it('raises an InvalidKeyError when the tuning key is unknown'):
+            expect(lambda: shredgen.tune_scale('A maj pen', 'H')).to(raise_error(shredgen.InvalidKeyError))
+
+    with description(shredgen.generate_riff):
+        with it('returns a riff of the given length in the tuned scale'):
+            riff = shredgen.generate_riff('A maj pen', 'C', 5)
+            expect(riff).to(have_len(5))
+            expect(riff.scale.name).to(equal('C Major Pentatonic'))
+
+        with it('returns the same riff for the same seed'):
+            options = shredgen.RiffOptions(seed=42)
+            expect(list(shredgen.generate_riff('A maj pen', options=options))).to(
+                equal(list(shredgen.generate_riff('A maj pen', options=options))))
+
+        with it('does not print anything'):
+            when(builtins).print(...)
+            shredgen.generate_riff('A maj pen')
+            verify(builtins, times=0).print(...)
+
+        with it('raises an InvalidOptionError when the length is invalid'):
+            expect(lambda: shredgen.generate_riff('A maj pen', length=0)).to(
+                raise_error(shredgen.InvalidOptionError))
+
+        with it('raises an InvalidOptionError when the seed is invalid'):
+            expect(lambda: shredgen.generate_riff('A maj pen', options=shredgen.RiffOptions(seed='x'))).to(
+                raise_error(shredgen.InvalidOptionError))
+
+        with it('returns the notes from the start of the riff with the counter random number generator'):
+            riff = shredgen.generate_riff('A maj pen', length=30, options=shredgen.RiffOptions(seed=42, rng='counter'))
+            window = shredgen.generate_riff(
+                'A maj pen', length=10, options=shredgen.RiffOptions(seed=42, rng='counter', start=15))
+            expect(list(window)).to(equal(list(riff)[15:25]))
+
+    with description(shredgen.generate_riffs):
+        with it('returns the given number of riffs of the given length in the tuned scale'):
+            riffs = shredgen.generate_riffs('A maj pen', 'C', 5, 3, max_workers=2)
+            expect(riffs).to(have_len(3))
+
+            for riff in riffs:
+                expect(riff).to(have_len(5))
+                expect(riff.scale.name).to(equal('C Major Pentatonic'))
+
+        with it('returns the riffs that _generate_riffs() generates for the same seed'):
+            options = shredgen.RiffOptions(seed=42, model='markov')
+            riffs = shredgen.generate_riffs('A maj pen', 'C', 20, 4, options, max_workers=2)
+            expected = shredgen._generate_riffs(shredgen.tune_scale('A maj pen', 'C'), 20, 4, options, 1)
+            expect([riff.indices for riff in riffs]).to(equal([riff.indices for riff in expected]))
+
+        with it('raises an InvalidOptionError when the count is invalid'):
+            expect(lambda: shredgen.generate_riffs('A maj pen', count=0)).to(raise_error(shredgen.InvalidOptionError))
+
+        with it('raises an InvalidOptionError when the number of workers is invalid'):
+            expect(lambda: shredgen.generate_riffs('A maj pen', max_workers='x')).to(
+                raise_error(shredgen.InvalidOptionError))
+
+    with description(shredgen.rank_riff):
+        with before.each:
+            self.scale = shredgen.Scale('Test', 'A', [], [shredgen.Note('A', i) for i in range(3)])
+
+        with it('ranks a riff by its indices as base scale length digits'):
+            expect(shredgen.rank_riff(shredgen.Riff(self.scale, bytearray([0, 0])))).to(equal(0))
+            expect(shredgen.rank_riff(shredgen.Riff(self.scale, bytearray([1, 2])))).to(equal(5))
+            expect(shredgen.rank_riff(shredgen.Riff(self.scale, bytearray([2, 2, 2])))).to(equal(26))
+
+        with it('is undone by unranking'):
+            riff = shredgen.generate_riff('A maj pen', length=40, options=shredgen.RiffOptions(seed=3))
+            rank = shredgen.rank_riff(riff)
+            expect(shredgen.unrank_riff(riff.scale, 40, rank).indices).to(equal(riff.indices))
+
+    with description(shredgen.unrank_riff):
+        with before.each:
+            self.scale = shredgen.Scale('Test', 'A', [], [shredgen.Note('A', i) for i in range(3)])
+
+        with it('returns the riff at the given rank'):
+            expect(bytes(shredgen.unrank_riff(self.scale, 3, 5).indices)).to(equal(b'\x00\x01\x02'))
+
+        with it('throws an error when the rank is past the last riff'):
+            expect(lambda: shredgen.unrank_riff(self.scale, 2, 9)).to(raise_error(shredgen.InvalidOptionError))
+
+        with it('throws an error when the rank is a bool'):
+            expect(lambda: shredgen.unrank_riff(self.scale, 2, True)).to(raise_error(shredgen.InvalidOptionError))
+
+        with it('returns the riff that rank_riff() ranks, for riffs with more digits than Python converts to strings'):
+            scale = shredgen.get_scale('A maj pen')
+            riff = shredgen.generate_riff(scale, length=4000, options=shredgen.RiffOptions(seed=3))
+            expect(bytes(shredgen.unrank_riff(scale, 4000, shredgen.rank_riff(riff)).indices)).to(
+                equal(bytes(riff.indices)))
+
+    with description(shredgen.enumerate_riffs):
+        with before.each:
+            self.scale = shredgen.Scale('Test', 'A', [], [shredgen.Note('A', i) for i in range(3)])
+
+        with it('yields every riff in rank order'):
+            riffs = list(shredgen.enumerate_riffs(self.scale, 2))
+            expect([shredgen.rank_riff(riff) for riff in riffs]).to(equal(list(range(9))))
+
+        with it('yields the given number of riffs from the given rank'):
+            riffs = list(shredgen.enumerate_riffs(self.scale, 3, 7, 4))
+            expect([bytes(riff.indices) for riff in riffs]).to(
+                equal([b'\x00\x02\x01', b'\x00\x02\x02', b'\x01\x00\x00', b'\x01\x00\x01']))
+
+        with it('stops at the last riff'):
+            expect(list(shredgen.enumerate_riffs(self.scale, 2, 7, 5))).to(have_len(2))
+
+        with it('makes riffs as they are needed'):
+            riffs = shredgen.enumerate_riffs(shredgen.get_scale('A maj pen'), 1000, 10 ** 100)
+            expect(shredgen.rank_riff(next(riffs))).to(equal(10 ** 100))
+
+    with description(shredgen.render_tab):
+        with it('returns the tab for the notes'):
+            expect(shredgen.render_tab(shredgen.get_scale('A maj pen').notes)).to(
+                equal(str(shredgen.ASCIITab(shredgen.get_scale('A maj pen').notes))))
+
+    with description(shredgen.ExitCodeError):
+        with it('is the base of the typed errors'):
+            for error_type in (shredgen.UnknownScaleError, shredgen.InvalidKeyError, shredgen.InvalidOptionError,
+                               shredgen.InvalidCorpusError):
+                expect(issubclass(error_type, shredgen.ExitCodeError)).to(be(True))
+
     with description(shredgen._parse_opts):
+        with it('returns the simply parsed options when the arguments are simple'):
+            opts = mock()
+            when(shredgen)._parse_simple_opts(['foo']).thenReturn(opts)
+            expect(shredgen._parse_opts(['foo'])).to(be(opts))
+
+        with it('returns the options parsed by argparse when the arguments are not simple'):
+            opts = mock()
+            when(shredgen)._parse_simple_opts(['-h']).thenReturn(None)
+            when(shredgen)._parse_all_opts(['-h']).thenReturn(opts)
+            expect(shredgen._parse_opts(['-h'])).to(be(opts))
+
+        with it('parses the command line arguments when given no arguments'):
+            orig_argv = sys.argv
+            sys.argv = ['shredgen.py', 'foo']
+            opts = mock()
+            when(shredgen)._parse_simple_opts(['foo']).thenReturn(opts)
+
+            try:
+                expect(shredgen._parse_opts()).to(be(opts))
+            finally:
+                sys.argv = orig_argv
+
+    with description(shredgen._parse_simple_opts):
+        with it('parses the same options as argparse'):
+            for args in [
+                    [],
+                    ['C Maj Pen'],
+                    ['--all-scales', '-t', 'C'],
+                    ['--all-scale-names'],
+                    ['Bb maj pen', '--only-tune', '--tuning', 'D'],
+                    ['-l', '5', '--seed', '42', 'CMajPen', '--stream', '--chunk-size', '2'],
+                    ['--length', '8', '-c', '3', '--count', '4'],
+                    ['-c', '3', '--export', 'riffs.shrc'],
+                    ['--corpus', 'riffs.shrc', '--riff', '2'],
+                    ['--model', 'markov', '-l', '3'],
+                    ['--model', 'Weighted', '--rng', 'Counter'],
+                    ['--model', 'foo', '--rng', 'bar'],
+                    ['--max-fret-jump', '2'],
+                    ['--rng', 'counter', '--start', '5'],
+                    ['--stream', '--rng', 'counter', '--workers', '4'],
+                    ['--enumerate', '--rank', '7', '-c', '2'],
+            ]:
+                expect(vars(shredgen._parse_simple_opts(args))).to(equal(vars(shredgen._parse_all_opts(args))))
+
+        with it('returns None when asked for help'):
+            expect(shredgen._parse_simple_opts(['-h'])).to(be_none)
+
+        with it('leaves the model & rng to be validated the same way as when argparse parses them'):
+            opts = shredgen._parse_all_opts(['--model=Weighted', '--rng=foo'])
+            expect((opts.model, opts.rng)).to(equal(('Weighted', 'foo')))
+
+        with it('returns None when given an unknown or abbreviated option'):
+            expect(shredgen._parse_simple_opts(['--len', '5'])).to(be_none)
+
+        with it('returns None when given more than one positional argument'):
+            expect(shredgen._parse_simple_opts(['foo', 'bar'])).to(be_none)
+
+        with it('returns None when an option is missing its value'):
+            expect(shredgen._parse_simple_opts(['--length'])).to(be_none)
+            expect(shredgen._parse_simple_opts(['--length', '--stream'])).to(be_none)
+
+    with description(shredgen._parse_all_opts):
         with it('returns the parsed arguments'):
             parser = mock(argparse.ArgumentParser)
             args = mock({'foo': 'bar'})
 
             when(parser).add_argument(...)
-            when(parser).parse_args(...).thenReturn(args)
+            when(parser).parse_args(['foo']).thenReturn(args)
             when(argparse).ArgumentParser(...).thenReturn(parser)
 
-            expect(shredgen._parse_opts()).to(be(args))
+            expect(shredgen._parse_all_opts(['foo'])).to(be(args))
 
     with description(shredgen._update_default_opts):
         with before.each:
@@ -84,9 +347,113 @@ with description(shredgen) as self:
             shredgen._update_default_opts(self.opts)
             expect(self.opts.length).to(equal('foo'))
 
+    with description(shredgen._start_profiling):
+        with before.each:
+            self.opts = mock({'profile': False, 'profile_file': None, 'cprofile_file': None})
+
+        with after.each:
+            shredgen._profiler = None
+
+        with it('does not profile when no profiling option is given'):
+            shredgen._start_profiling(self.opts, (0, 0))
+            expect(shredgen._profiler).to(be_none)
+
+        with it('profiles when any profiling option is given'):
+            for option, value in [('profile', True), ('profile_file', 'foo.json'), ('cprofile_file', 'foo.prof')]:
+                opts = mock(dict({'profile': False, 'profile_file': None, 'cprofile_file': None}, **{option: value}))
+                shredgen._start_profiling(opts, (time.perf_counter(), 0))
+                expect(shredgen._profiler).not_to(be_none)
+                shredgen._profiler.stop_all()
+                shredgen._profiler = None
+
+    with description(shredgen._stop_profiling):
+        with before.each:
+            self.opts = mock({'profile': True, 'profile_file': None, 'cprofile_file': None})
+            self.profiler = mock(shredgen.Profiler)
+            when(self.profiler).stop_all().thenReturn({'total_seconds': 1})
+            when(builtins).print(...)
+            shredgen._profiler = self.profiler
+
+        with after.each:
+            shredgen._profiler = None
+
+        with it('prints the report to stderr'):
+            shredgen._stop_profiling(self.opts)
+            verify(builtins).print('{\n  "total_seconds": 1\n}', file=sys.stderr)
+
+        with it('writes the report to the profile file when given one'):
+            with tempfile.TemporaryDirectory() as temp_dir:
+                self.opts.profile_file = os.path.join(temp_dir, 'profile.json')
+                shredgen._stop_profiling(self.opts)
+
+                with open(self.opts.profile_file) as f:
+                    expect(f.read()).to(equal('{\n  "total_seconds": 1\n}\n'))
+
+        with it('dumps the cProfile stats when given a cProfile file'):
+            self.opts.cprofile_file = 'foo.prof'
+            when(self.profiler).dump_cprofile_stats(...)
+            shredgen._stop_profiling(self.opts)
+            verify(self.profiler).dump_cprofile_stats('foo.prof')
+
+        with it('stops profiling'):
+            shredgen._stop_profiling(self.opts)
+            expect(shredgen._profiler).to(be_none)
+
+        with it('does nothing when not profiling'):
+            shredgen._profiler = None
+            shredgen._stop_profiling(self.opts)
+            verify(builtins, times=0).print(...)
+
+        with it('reports a total time close to the sum of the phases, without the time to import json'):
+            class SlowJsonFinder:  # pylint: disable=too-few-public-methods
+                @staticmethod
+                def find_spec(name, *_args):
+                    if name == 'json':
+                        time.sleep(0.05)
+
+            shredgen._profiler = shredgen.Profiler((time.perf_counter(), 0))
+            json_module = sys.modules.pop('json')
+            sys.meta_path.insert(0, SlowJsonFinder)
+
+            try:
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    self.opts.profile_file = os.path.join(temp_dir, 'profile.json')
+                    shredgen._stop_profiling(self.opts)
+
+                    with open(self.opts.profile_file) as f:
+                        report = json_module.load(f)
+            finally:
+                sys.meta_path.remove(SlowJsonFinder)
+                sys.modules['json'] = json_module
+
+            phase_seconds = sum(phase['seconds'] for phase in report['phases'].values())
+            expect(report['total_seconds'] - phase_seconds).to(be_below(0.05))
+
+    with description(shredgen._phase):
+        with after.each:
+            shredgen._profiler = None
+
+        with it('records the phase with the profiler'):
+            shredgen._profiler = shredgen.Profiler((time.perf_counter(), 0))
+
+            with shredgen._phase('foo'):
+                pass
+
+            expect(shredgen._profiler.phases['foo']['calls']).to(equal(1))
+
+        with it('does nothing when not profiling'):
+            with shredgen._phase('foo'):
+                pass
+
     with description(shredgen._perform_user_action):
-        def opts(_self, all_scales=True, all_scale_names=True, only_tune=True):
+        def opts(_self, all_scales=True, all_scale_names=True, only_tune=True, serve=None, batch=False, corpus=None,
+                 export=None, enumerated=False):
             return mock({
+                'serve': serve,
+                'batch': batch,
+                'corpus': corpus,
+                'export': export,
+                'enumerate': enumerated,
                 'all_scales': all_scales,
                 'all_scale_names': all_scale_names,
                 'only_tune': only_tune
@@ -98,6 +465,40 @@ with description(shredgen) as self:
             when(shredgen)._display_all_scale_names(...)
             when(shredgen)._display_tuning(...)
             when(shredgen)._shred(...)
+            when(shredgen)._serve(...)
+            when(shredgen)._batch(...)
+            when(shredgen)._display_corpus_riff(...)
+            when(shredgen)._export_corpus(...)
+            when(shredgen)._display_enumerated_riffs(...)
+
+        with it('serves when given an address to serve on'):
+            opts = self.opts(serve='1234')
+            shredgen._perform_user_action(opts)
+            verify(shredgen)._serve(opts)
+            verify(shredgen, times=0)._display_all_scales(...)
+
+        with it('answers batch requests from stdin when that flag is true'):
+            shredgen._perform_user_action(self.opts(batch=True))
+            verify(shredgen)._batch(sys.stdin.buffer, sys.stdout.buffer)
+            verify(shredgen, times=0)._display_all_scales(...)
+
+        with it('displays a riff from the corpus when given a corpus file'):
+            opts = self.opts(corpus='riffs.shrc', export='other.shrc')
+            shredgen._perform_user_action(opts)
+            verify(shredgen)._display_corpus_riff(opts)
+            verify(shredgen, times=0)._export_corpus(...)
+
+        with it('exports a corpus when given a file to export to'):
+            opts = self.opts(export='riffs.shrc')
+            shredgen._perform_user_action(opts)
+            verify(shredgen)._export_corpus(opts)
+            verify(shredgen, times=0)._display_all_scales(...)
+
+        with it('displays enumerated riffs when that flag is true'):
+            opts = self.opts(enumerated=True)
+            shredgen._perform_user_action(opts)
+            verify(shredgen)._display_enumerated_riffs(opts)
+            verify(shredgen, times=0)._display_all_scales(...)
 
         with it('displays all the scales when that flag is true'):
             opts = self.opts()
@@ -153,8 +554,13 @@ with description(shredgen) as self:
             when(shredgen).ASCIITab(scale_c.notes).thenReturn(atab_c)
 
             when(shredgen)._get_all_scales(...).thenReturn([scale_a, scale_b, scale_c])
+            when(shredgen)._print_cached(...).thenAnswer(lambda key, render: print(render()))
             when(builtins).print(...)
 
+        with it('caches the output by the action'):
+            shredgen._display_all_scales_no_tuning()
+            verify(shredgen)._print_cached(('all-scales',), ...)
+
         with it('displays the scale name & ASCII tab for each scale'):
             shredgen._display_all_scales_no_tuning()
             verify(builtins).print(
@@ -195,8 +601,14 @@ with description(shredgen) as self:
                 'Tuned Scale: Scale B Tuned\nascii tab b tuned'
             ).thenReturn('joined Scale B & Scale B Tuned')
 
+            when(shredgen)._get_key_num('C').thenReturn(3)
+            when(shredgen)._print_cached(...).thenAnswer(lambda key, render: print(render()))
             when(builtins).print(...)
 
+        with it('caches the output by the action and the tuning key number'):
+            shredgen._display_all_scales_with_tuning(mock({'tuning': 'C'}))
+            verify(shredgen)._print_cached(('all-scales', 3), ...)
+
         with it('displays the original scale & tuned scale for each scale'):
             shredgen._display_all_scales_with_tuning(mock({'tuning': 'C'}))
             verify(builtins).print(
@@ -224,8 +636,15 @@ with description(shredgen) as self:
             when(shredgen)._validate_scale(...)
             when(shredgen)._get_scale_by_name(...).thenReturn(self.orig_scale)
             when(shredgen)._get_tuned_scale(...).thenReturn(self.tune_scale)
+            when(shredgen)._get_key_num('T').thenReturn(4)
+            when(shredgen)._print_cached(...).thenAnswer(lambda key, render: print(render()))
             when(builtins).print(...)
 
+        with it('caches the output by the action, the normalized scale name, and the tuning key number'):
+            self.opts.scale = ' Foo Bar '
+            shredgen._display_tuning(self.opts)
+            verify(shredgen)._print_cached(('only-tune', 'foobar', 4), ...)
+
         with it('validates the stripped and lowered scale name when the opts has a scale'):
             shredgen._display_tuning(self.opts)
             verify(shredgen)._validate_scale_name('foo')
@@ -237,7 +656,7 @@ with description(shredgen) as self:
 
         with it('gets and validates the scale by name'):
             shredgen._display_tuning(self.opts)
-            verify(shredgen)._validate_scale(self.opts, self.orig_scale)
+            verify(shredgen)._validate_scale(self.opts.scale, self.orig_scale)
 
         with it('gets the tuned scale'):
             shredgen._display_tuning(self.opts)
@@ -252,6 +671,82 @@ with description(shredgen) as self:
                 'ascii tab tuned'
             )
 
+    with description(shredgen._print_cached):
+        with before.each:
+            self.cache_dir = tempfile.TemporaryDirectory()
+            when(shredgen)._get_cache_dir().thenReturn(self.cache_dir.name)
+            when(builtins).print(...)
+
+        with after.each:
+            self.cache_dir.cleanup()
+
+        with it('prints the rendered output'):
+            shredgen._print_cached(('foo',), lambda: 'output')
+            verify(builtins).print('output')
+
+        with it('prints the cached output instead of rendering it again'):
+            shredgen._print_cached(('foo',), lambda: 'output')
+            shredgen._print_cached(('foo',), lambda: 'rendered again')
+            verify(builtins, times=2).print('output')
+
+        with it('renders the output again for a different key'):
+            shredgen._print_cached(('foo',), lambda: 'output')
+            shredgen._print_cached(('bar',), lambda: 'other output')
+            verify(builtins).print('other output')
+
+        with it('does not leave temporary files in the cache directory'):
+            shredgen._print_cached(('foo',), lambda: 'output')
+            version_dir = os.path.dirname(shredgen._get_cache_path(('foo',)))
+            expect([name for name in os.listdir(version_dir) if not name.endswith('.txt')]).to(be_empty)
+
+        with it('removes the entries cached by other versions that have not been written for a while when writing'):
+            old_version_dir = os.path.join(self.cache_dir.name, 'old')
+            os.mkdir(old_version_dir)
+            open(os.path.join(old_version_dir, 'foo.txt'), 'w').close()
+            open(os.path.join(self.cache_dir.name, 'bar.txt'), 'w').close()
+            old_time = time.time() - shredgen._CACHE_PRUNE_AGE_SECONDS - 60
+            os.utime(old_version_dir, (old_time, old_time))
+            os.utime(os.path.join(self.cache_dir.name, 'bar.txt'), (old_time, old_time))
+
+            shredgen._print_cached(('foo',), lambda: 'output')
+
+            expect(os.listdir(self.cache_dir.name)).to(
+                equal([os.path.basename(os.path.dirname(shredgen._get_cache_path(('foo',))))]))
+
+        with it('keeps the entries cached by other versions that have been written recently'):
+            other_version_dir = os.path.join(self.cache_dir.name, 'other')
+            os.mkdir(other_version_dir)
+            open(os.path.join(other_version_dir, 'foo.txt'), 'w').close()
+
+            shredgen._print_cached(('foo',), lambda: 'output')
+
+            expect(os.listdir(other_version_dir)).to(equal(['foo.txt']))
+
+        with it('prints the rendered output when the cache cannot be written'):
+            when(shredgen)._get_cache_dir().thenReturn(os.path.join(self.cache_dir.name, 'file', 'dir'))
+            open(os.path.join(self.cache_dir.name, 'file'), 'w').close()
+            shredgen._print_cached(('foo',), lambda: 'output')
+            verify(builtins).print('output')
+
+    with description(shredgen._get_cache_path):
+        with it('returns a path in a directory of its own for the cache version'):
+            when(shredgen)._get_cache_dir().thenReturn('/cache')
+            path = shredgen._get_cache_path(('foo',))
+            expect(os.path.dirname(path)).to(equal(os.path.join('/cache', 'v{}'.format(shredgen._CACHE_VERSION))))
+
+        with it('returns a different path for each key'):
+            expect(shredgen._get_cache_path(('foo',))).not_to(equal(shredgen._get_cache_path(('bar',))))
+
+    with description(shredgen._get_cache_dir):
+        with it('returns the shredgen directory in the XDG cache home'):
+            when(os.environ).get('XDG_CACHE_HOME').thenReturn('/xdg/cache')
+            expect(shredgen._get_cache_dir()).to(equal('/xdg/cache/shredgen'))
+
+        with it('returns the shredgen directory in ~/.cache when there is no XDG cache home'):
+            when(os.environ).get('XDG_CACHE_HOME').thenReturn(None)
+            when(os.path).expanduser('~').thenReturn('/home/foo')
+            expect(shredgen._get_cache_dir()).to(equal('/home/foo/.cache/shredgen'))
+
     with description(shredgen._display_all_scale_names):
         def scale(_self, name, aliases):  # pylint: disable=function-redefined
             return mock({'name': name, 'aliases': aliases}, spec=shredgen.Scale)
@@ -276,14 +771,29 @@ with description(shredgen) as self:
         with before.each:
             self.opts = mock({
                 'scale': ' \t\r\nFoO\n\r\t ',
-                'length': ' \t\r\n5\n\r\t '
+                'tuning': 'A',
+                'length': ' \t\r\n5\n\r\t ',
+                'model': ' Uniform ',
+                'max_fret_jump': None,
+                'rng': 'sequential',
+                'start': 0,
+                'workers': None,
+                'stream': False,
+                'chunk_size': ' \t\r\n3\n\r\t ',
+                'seed': None,
+                'count': ' 1 '
             })
             self.scale = mock(shredgen.Scale)
             when(shredgen)._get_scale_by_name(...).thenReturn(self.scale)
             when(shredgen)._validate_scale_name(...)
             when(shredgen)._validate_scale(...)
             when(shredgen)._validate_length(...)
+            when(shredgen)._validate_chunk_size(...)
+            when(shredgen)._validate_seed(...)
+            when(shredgen)._validate_count(...)
             when(shredgen)._shred_in_scale(...)
+            when(shredgen)._shred_many_in_scale(...)
+            when(shredgen)._shred_in_scale_in_parallel(...)
 
         with it('validates the scale stripped and lowered name when the opts has a scale'):
             shredgen._shred(self.opts)
@@ -297,7 +807,7 @@ with description(shredgen) as self:
         with it('validates the scale'):
             shredgen._shred(self.opts)
             when(shredgen)._get_scale_by_name('foo').thenReturn(self.scale)
-            verify(shredgen)._validate_scale(self.opts, self.scale)
+            verify(shredgen)._validate_scale(self.opts.scale, self.scale)
 
         with it('validates the stripped length'):
             shredgen._shred(self.opts)
@@ -305,7 +815,337 @@ with description(shredgen) as self:
 
         with it('shreds in the scale'):
             shredgen._shred(self.opts)
-            verify(shredgen)._shred_in_scale(self.scale, 5)
+            verify(shredgen)._shred_in_scale(
+                self.scale, 5, None, arg_that(lambda rng: isinstance(rng, random.Random)), shredgen.RiffOptions())
+
+        with it('validates the stripped chunk size when streaming'):
+            self.opts.stream = True
+            shredgen._shred(self.opts)
+            verify(shredgen)._validate_chunk_size('3')
+
+        with it('does not validate the chunk size when not streaming'):
+            shredgen._shred(self.opts)
+            verify(shredgen, times=0)._validate_chunk_size(...)
+
+        with it('shreds in the scale in chunks when streaming'):
+            self.opts.stream = True
+            shredgen._shred(self.opts)
+            verify(shredgen)._shred_in_scale(self.scale, 5, 3, ...)
+
+        with it('shreds with the stripped and lowered model'):
+            self.opts.model = ' Markov '
+            shredgen._shred(self.opts)
+            verify(shredgen)._shred_in_scale(self.scale, 5, None, ..., shredgen.RiffOptions(model='markov'))
+
+        with it('shreds with the stripped max fret jump'):
+            self.opts.max_fret_jump = ' 2 '
+            shredgen._shred(self.opts)
+            verify(shredgen)._shred_in_scale(self.scale, 5, None, ..., shredgen.RiffOptions(max_fret_jump=2))
+
+        with it('throws an error when the model is unknown'):
+            self.opts.model = 'foo'
+            expect(lambda: shredgen._shred(self.opts)).to(raise_error(shredgen.InvalidOptionError))
+
+        with it('validates the stripped seed when given a seed'):
+            self.opts.seed = ' 42 '
+            shredgen._shred(self.opts)
+            verify(shredgen)._validate_seed('42')
+
+        with it('shreds with a random number generator seeded with the given seed'):
+            self.opts.seed = '42'
+            shredgen._shred(self.opts)
+            expected = random.Random(42).random()
+            verify(shredgen)._shred_in_scale(self.scale, 5, None, arg_that(lambda rng: rng.random() == expected), ...)
+
+        with it('validates the stripped count'):
+            self.opts.stream = True
+            shredgen._shred(self.opts)
+            verify(shredgen)._validate_count('1', True)
+
+        with it('shreds many riffs in the scale when the count is greater than one'):
+            self.opts.count = '3'
+            self.opts.seed = '42'
+            shredgen._shred(self.opts)
+            verify(shredgen)._shred_many_in_scale(self.scale, 5, 3, shredgen.RiffOptions(seed=42), None)
+
+        with it('shreds many riffs with the given number of workers'):
+            self.opts.count = '3'
+            self.opts.workers = ' 2 '
+            shredgen._shred(self.opts)
+            verify(shredgen)._shred_many_in_scale(self.scale, 5, 3, shredgen.RiffOptions(), 2)
+
+        with it('shreds one riff in parallel when streaming with the counter random number generator'):
+            self.opts.stream = True
+            self.opts.rng = 'counter'
+            self.opts.seed = '42'
+            self.opts.workers = '2'
+            shredgen._shred(self.opts)
+            verify(shredgen)._shred_in_scale_in_parallel(
+                self.scale, 5, 3, shredgen.RiffOptions(seed=42, rng='counter'), 2)
+            verify(shredgen, times=0)._shred_in_scale(...)
+
+        with it('throws an error when shredding one riff with many workers without streaming'):
+            self.opts.rng = 'counter'
+            self.opts.workers = '2'
+            expect(lambda: shredgen._shred(self.opts)).to(raise_error(shredgen.InvalidOptionError))
+
+        with it('shreds from the start with a counter random number generator'):
+            self.opts.rng = ' Counter '
+            self.opts.start = ' 7 '
+            shredgen._shred(self.opts)
+            verify(shredgen)._shred_in_scale(
+                self.scale, 5, None, arg_that(lambda rng: isinstance(rng, shredgen.CounterRandom) and rng.index == 7),
+                shredgen.RiffOptions(rng='counter', start=7))
+
+        with it('throws an error when starting past the first note with the sequential random number generator'):
+            self.opts.start = '7'
+            expect(lambda: shredgen._shred(self.opts)).to(raise_error(shredgen.InvalidOptionError))
+            verify(shredgen, times=0)._shred_in_scale(...)
+
+    with description(shredgen._export_corpus):
+        with before.each:
+            self.temp_dir = tempfile.TemporaryDirectory()
+            self.opts = mock({
+                'scale': 'C Maj Pen',
+                'tuning': 'A',
+                'length': '5',
+                'seed': '42',
+                'model': 'uniform',
+                'max_fret_jump': None,
+                'rng': 'sequential',
+                'start': 0,
+                'count': '3',
+                'export': os.path.join(self.temp_dir.name, 'riffs.shrc'),
+            })
+
+        with after.each:
+            self.temp_dir.cleanup()
+
+        with it('writes the same riffs that would be shredded with the same options'):
+            when(shredgen)._generate_riffs(...).thenAnswer(
+                lambda scale, length, count, options: [
+                    shredgen.generate_riff(scale, length=length, options=shredgen.RiffOptions(seed=i))
+                    for i in range(count)])
+            shredgen._export_corpus(self.opts)
+
+            with shredgen.RiffCorpus(self.opts.export) as corpus:
+                expect(len(corpus)).to(equal(3))
+                expect(list(corpus[2])).to(equal(list(shredgen.generate_riff(
+                    'C Maj Pen', length=5, options=shredgen.RiffOptions(seed=2)))))
+
+        with it('writes a riff seeded with the given seed when the count is one'):
+            self.opts.count = '1'
+            shredgen._export_corpus(self.opts)
+
+            with shredgen.RiffCorpus(self.opts.export) as corpus:
+                expect(list(corpus[0])).to(equal(list(shredgen.generate_riff(
+                    'C Maj Pen', length=5, options=shredgen.RiffOptions(seed=42)))))
+
+        with it('validates the stripped count'):
+            when(shredgen)._validate_count(...).thenRaise(shredgen.InvalidOptionError('foo', 11))
+            self.opts.count = ' x '
+            expect(lambda: shredgen._export_corpus(self.opts)).to(raise_error(shredgen.InvalidOptionError))
+            verify(shredgen)._validate_count('x', False)
+
+    with description(shredgen._display_corpus_riff):
+        with before.each:
+            self.temp_dir = tempfile.TemporaryDirectory()
+            self.path = os.path.join(self.temp_dir.name, 'riffs.shrc')
+            self.riffs = [
+                shredgen.generate_riff('C Maj Pen', length=4, options=shredgen.RiffOptions(seed=i)) for i in range(3)]
+            shredgen.write_corpus(self.path, self.riffs)
+            when(builtins).print(...)
+
+        with after.each:
+            self.temp_dir.cleanup()
+
+        with it('prints the tab of the riff at the stripped index'):
+            shredgen._display_corpus_riff(mock({'corpus': self.path, 'riff': ' 1 '}))
+            verify(builtins).print(arg_that(lambda tab: str(tab) == shredgen.render_tab(self.riffs[1])))
+
+        with it('throws an error when the index is out of range'):
+            expect(lambda: shredgen._display_corpus_riff(mock({'corpus': self.path, 'riff': '3'}))).to(
+                raise_error(shredgen.InvalidOptionError))
+
+    with description(shredgen._batch):
+        with it('writes a response line for each request line in the same order'):
+            lengths = [i % 7 + 1 for i in range(10000)]  # enough requests to need more than one read
+            stdin = io.BytesIO(b''.join(b'{"length": %d, "seed": 1}\n' % length for length in lengths))
+            stdout = io.BytesIO()
+
+            shredgen._batch(stdin, stdout)
+
+            responses = [json.loads(line.decode('utf-8')) for line in stdout.getvalue().splitlines()]
+            expect([len(response['notes']) for response in responses]).to(equal(lengths))
+
+        with it('writes an error response for each invalid request line'):
+            stdout = io.BytesIO()
+            shredgen._batch(io.BytesIO(b'foo\n{"length": 2}\n'), stdout)
+
+            responses = [json.loads(line.decode('utf-8')) for line in stdout.getvalue().splitlines()]
+            expect(responses[0]['err_code']).to(equal(shredgen._ERR_INVALID_REQUEST))
+            expect(responses[1]['notes']).to(have_len(2))
+
+        with it('does not limit the length of riffs'):
+            stdout = io.BytesIO()
+            shredgen._batch(io.BytesIO(b'{"length": %d}\n' % (shredgen._MAX_SERVE_LENGTH + 1)), stdout)
+            expect(json.loads(stdout.getvalue().decode('utf-8'))['notes']).to(have_len(shredgen._MAX_SERVE_LENGTH + 1))
+
+    with description(shredgen._parse_address):
+        with it('returns localhost & the port when given a port'):
+            expect(shredgen._parse_address(' 1234 ')).to(equal(('localhost', 1234, None)))
+
+        with it('returns the host & port when given a host & port'):
+            expect(shredgen._parse_address('127.0.0.1:1234')).to(equal(('127.0.0.1', 1234, None)))
+
+        with it('returns the path when given a path'):
+            expect(shredgen._parse_address('/tmp/shredgen.sock')).to(equal((None, None, '/tmp/shredgen.sock')))
+            expect(shredgen._parse_address('./shredgen.sock')).to(equal((None, None, './shredgen.sock')))
+
+        with it('throws an error when given neither a port nor a path'):
+            expect(lambda: shredgen._parse_address('foo')).to(raise_error(shredgen.ExitCodeError))
+            expect(lambda: shredgen._parse_address('localhost:foo')).to(raise_error(shredgen.ExitCodeError))
+
+    with description(shredgen._warm_up):
+        with it('indexes the scale and key names for suggestions'):
+            scale_name_index = mock()
+            key_name_index = mock()
+            when(shredgen)._get_all_scales().thenReturn([])
+            when(shredgen)._get_scale_name_index().thenReturn(scale_name_index)
+            when(shredgen)._get_key_name_index().thenReturn(key_name_index)
+
+            shredgen._warm_up()
+
+            verify(scale_name_index).index_suggestions()
+            verify(key_name_index).index_suggestions()
+
+    with description(shredgen._serve):
+        with it('removes the Unix socket when it stops serving'):
+            def interrupt():
+                raise KeyboardInterrupt()
+
+            loop = asyncio.new_event_loop()
+            when(asyncio).new_event_loop().thenReturn(loop)
+            when(shredgen)._warm_up()
+            when(builtins).print(...).thenAnswer(lambda *args, **kwargs: loop.call_soon(interrupt))
+
+            with tempfile.TemporaryDirectory() as temp_dir:
+                path = os.path.join(temp_dir, 'shredgen.sock')
+                shredgen._serve(mock({'serve': path, 'workers': None}))
+                expect(os.path.exists(path)).to(equal(False))
+
+    with description(shredgen._handle_connection):
+        with it('answers each request line sent on the connection'):
+            async def exchange(path):
+                server = await asyncio.start_unix_server(shredgen._handle_connection, path)
+                reader, writer = await asyncio.open_unix_connection(path)
+                writer.write(b'{"length": 3, "seed": 1}\n{"length": 0}\n')
+                writer.write_eof()
+                lines = [await reader.readline(), await reader.readline()]
+                expect(await reader.read()).to(equal(b''))  # i.e. the server closed the connection after the EOF
+                writer.close()
+                server.close()
+                await server.wait_closed()
+                return lines
+
+            loop = asyncio.new_event_loop()
+
+            with tempfile.TemporaryDirectory() as temp_dir:
+                try:
+                    lines = loop.run_until_complete(exchange(os.path.join(temp_dir, 'shredgen.sock')))
+                finally:
+                    loop.close()
+
+            expect(json.loads(lines[0].decode('utf-8'))['notes']).to(have_len(3))
+            expect(json.loads(lines[1].decode('utf-8'))['err_code']).to(equal(shredgen._ERR_LENGTH_TOO_LOW))
+
+        with it('answers the request lines in the given executor'):
+            class RecordingExecutor(concurrent.futures.ThreadPoolExecutor):
+                def __init__(self):
+                    super().__init__(1)
+                    self.funcs = []
+
+                def submit(self, fn, *args, **kwargs):  # pylint: disable=arguments-differ
+                    self.funcs.append(fn)
+                    return super().submit(fn, *args, **kwargs)
+
+            async def exchange(path, executor):
+                server = await asyncio.start_unix_server(
+                    lambda reader, writer: shredgen._handle_connection(reader, writer, executor), path)
+                reader, writer = await asyncio.open_unix_connection(path)
+                writer.write(b'{"length": 3}\n')
+                writer.write_eof()
+                await reader.read()
+                writer.close()
+                server.close()
+                await server.wait_closed()
+
+            loop = asyncio.new_event_loop()
+            executor = RecordingExecutor()
+
+            with tempfile.TemporaryDirectory() as temp_dir:
+                try:
+                    loop.run_until_complete(exchange(os.path.join(temp_dir, 'shredgen.sock'), executor))
+                finally:
+                    loop.close()
+                    executor.shutdown()
+
+            expect(executor.funcs).to(equal([shredgen._handle_request_line]))
+
+    with description(shredgen._handle_request_line):
+        with it('returns the JSON response to the JSON request as a line of bytes'):
+            when(shredgen)._handle_request({'length': 3}, 5).thenReturn({'foo': 'bar'})
+            expect(shredgen._handle_request_line(b'{"length": 3}\n', 5)).to(equal(b'{"foo": "bar"}\n'))
+
+        with it('accepts a request line that is a string'):
+            when(shredgen)._handle_request({'length': 3}, None).thenReturn({'foo': 'bar'})
+            expect(shredgen._handle_request_line('{"length": 3}')).to(equal(b'{"foo": "bar"}\n'))
+
+        with it('returns an error response when the request is not JSON'):
+            response = json.loads(shredgen._handle_request_line(b'foo\n').decode('utf-8'))
+            expect(response['err_code']).to(equal(shredgen._ERR_INVALID_REQUEST))
+
+    with description(shredgen._handle_request):
+        with it('returns the notes & tab of a riff generated as the command line would'):
+            response = shredgen._handle_request({'scale': 'C Maj Pen', 'length': '5', 'seed': 42})
+            riff = shredgen._generate_riff(shredgen._get_scale_by_name('CMajPen'), 5, random.Random(42))
+
+            expect(response).to(equal({
+                'scale': 'C Major Pentatonic',
+                'notes': [str(note) for note in riff],
+                'tab': str(shredgen.ASCIITab(riff))
+            }))
+
+        with it('returns the tuned scale when only tuning'):
+            opts = shredgen._get_request_opts({'only_tune': True, 'tuning': 'C'})
+            expect(shredgen._handle_request({'only_tune': True, 'tuning': 'C'})).to(equal({
+                'tab': shredgen._render_tuning(opts, 'amajpen')
+            }))
+
+        with it('returns the error when the request is invalid'):
+            expect(shredgen._handle_request({'scale': 'foo'})['err_code']).to(equal(shredgen._ERR_UNKNOWN_SCALE))
+            expect(shredgen._handle_request({'length': 'x'})['err_code']).to(equal(shredgen._ERR_LENGTH_NOT_INT))
+            expect(shredgen._handle_request({'seed': 'x'})['err_code']).to(equal(shredgen._ERR_SEED_NOT_INT))
+
+        with it('returns an error when the length is greater than the given maximum length'):
+            expect(shredgen._handle_request({'length': 6}, 5)['err_code']).to(equal(shredgen._ERR_LENGTH_TOO_HIGH))
+            expect(shredgen._handle_request({'length': 5}, 5)).not_to(have_key('err_code'))
+
+    with description(shredgen._get_request_opts):
+        with it('returns the command line defaults for any fields not in the request'):
+            opts = shredgen._get_request_opts({'scale': 'foo'})
+            expect(opts.scale).to(equal('foo'))
+            expect(opts.length).to(equal(shredgen._DEFAULT_LENGTH))
+            expect(opts.tuning).to(equal(shredgen._DEFAULT_TUNING))
+
+        with it('throws an error when the request is not an object'):
+            expect(lambda: shredgen._get_request_opts([])).to(raise_error(shredgen.ExitCodeError))
+
+        with it('throws an error when the request has an unknown field'):
+            expect(lambda: shredgen._get_request_opts({'stream': True})).to(raise_error(shredgen.ExitCodeError))
+
+        with it('throws an error when the scale is not a string'):
+            expect(lambda: shredgen._get_request_opts({'scale': 5})).to(raise_error(shredgen.ExitCodeError))
 
     with description(shredgen._validate_scale_name):
         with it('does not throw an exception when given a non-empty scale name'):
@@ -319,14 +1159,21 @@ with description(shredgen) as self:
 
     with description(shredgen._validate_scale):
         with before.each:
-            self.opts = mock({'scale': 'mock_scale'})
             when(shredgen)._basename().thenReturn('shredgen')
 
         with it('does not throw an error when the given scale exists'):
-            expect(lambda: shredgen._validate_scale(self.opts, mock(shredgen.Scale))).not_to(raise_error)
+            expect(lambda: shredgen._validate_scale('mock_scale', mock(shredgen.Scale))).not_to(raise_error)
 
         with it('throws an error when the given scale is None'):
-            expect(lambda: shredgen._validate_scale(self.opts, None)).to(raise_error(shredgen.ExitCodeError))
+            expect(lambda: shredgen._validate_scale('mock_scale', None)).to(raise_error(shredgen.UnknownScaleError))
+
+        with it('suggests the closest scale names'):
+            expect(lambda: shredgen._validate_scale('C maj pan', None)).to(
+                raise_error(shredgen.UnknownScaleError, contain('Did you mean: C Maj Pen?')))
+
+        with it('does not suggest command line options, since the error may not be from the command line'):
+            expect(lambda: shredgen._validate_scale('C maj pan', None)).to(
+                raise_error(shredgen.UnknownScaleError, 'Unknown scale: C maj pan\nDid you mean: C Maj Pen?'))
 
     with description(shredgen._validate_length):
         with it('does not throw an error when the length is a positive integer'):
@@ -347,7 +1194,242 @@ with description(shredgen) as self:
         with it('throws an error when the length is a invalid base 10 number'):
             expect(lambda: shredgen._validate_length('FF')).to(raise_error(shredgen.ExitCodeError))
 
+    with description(shredgen._validate_chunk_size):
+        with it('does not throw an error when the chunk size is a positive integer'):
+            expect(lambda: shredgen._validate_chunk_size('3')).not_to(raise_error)
+
+        with it('throws an error when the chunk size is zero'):
+            expect(lambda: shredgen._validate_chunk_size('0')).to(raise_error(shredgen.ExitCodeError))
+
+        with it('throws an error when the chunk size is not a number'):
+            expect(lambda: shredgen._validate_chunk_size('foo')).to(raise_error(shredgen.ExitCodeError))
+
+    with description(shredgen._validate_seed):
+        with it('does not throw an error when the seed is an integer'):
+            expect(lambda: shredgen._validate_seed('-3')).not_to(raise_error)
+
+        with it('throws an error when the seed is not a number'):
+            expect(lambda: shredgen._validate_seed('foo')).to(raise_error(shredgen.ExitCodeError))
+
+    with description(shredgen._validate_count):
+        with it('does not throw an error when the count is a positive integer'):
+            expect(lambda: shredgen._validate_count('3', False)).not_to(raise_error)
+
+        with it('throws an error when the count is zero'):
+            expect(lambda: shredgen._validate_count('0', False)).to(raise_error(shredgen.ExitCodeError))
+
+        with it('throws an error when the count is not a number'):
+            expect(lambda: shredgen._validate_count('foo', False)).to(raise_error(shredgen.ExitCodeError))
+
+        with it('does not throw an error when streaming a single riff'):
+            expect(lambda: shredgen._validate_count('1', True)).not_to(raise_error)
+
+        with it('throws an error when streaming more than one riff'):
+            expect(lambda: shredgen._validate_count('2', True)).to(raise_error(shredgen.ExitCodeError))
+
+    with description(shredgen._validate_model):
+        with it('does not throw an error when given a known model'):
+            for model in ['uniform', 'weighted', 'markov']:
+                expect(lambda: shredgen._validate_model(model)).not_to(raise_error)
+
+        with it('throws an error when given an unknown model'):
+            expect(lambda: shredgen._validate_model('foo')).to(raise_error(shredgen.ExitCodeError))
+
+    with description(shredgen._validate_max_fret_jump):
+        with it('does not throw an error when the max fret jump is zero or more'):
+            expect(lambda: shredgen._validate_max_fret_jump('0')).not_to(raise_error)
+            expect(lambda: shredgen._validate_max_fret_jump('3')).not_to(raise_error)
+
+        with it('throws an error when the max fret jump is negative'):
+            expect(lambda: shredgen._validate_max_fret_jump('-1')).to(raise_error(shredgen.ExitCodeError))
+
+        with it('throws an error when the max fret jump is not a number'):
+            expect(lambda: shredgen._validate_max_fret_jump('foo')).to(raise_error(shredgen.ExitCodeError))
+
+    with description(shredgen._validate_rng):
+        with it('does not throw an error when given a known random number generator'):
+            for rng in ['sequential', 'counter']:
+                expect(lambda: shredgen._validate_rng(rng)).not_to(raise_error)
+
+        with it('throws an error when given an unknown random number generator'):
+            expect(lambda: shredgen._validate_rng('foo')).to(raise_error(shredgen.ExitCodeError))
+
+    with description(shredgen._validate_start):
+        with it('does not throw an error when starting at the first note'):
+            expect(lambda: shredgen._validate_start('0', 'sequential', 'markov', 1)).not_to(raise_error)
+
+        with it('does not throw an error when starting later with the counter random number generator'):
+            for model in ['uniform', 'weighted']:
+                expect(lambda: shredgen._validate_start('9', 'counter', model, None)).not_to(raise_error)
+
+        with it('throws an error when starting later with the sequential random number generator'):
+            expect(lambda: shredgen._validate_start('9', 'sequential', 'uniform', None)).to(
+                raise_error(shredgen.ExitCodeError))
+
+        with it('throws an error when starting later with a model that depends on the note before'):
+            expect(lambda: shredgen._validate_start('9', 'counter', 'markov', None)).to(
+                raise_error(shredgen.ExitCodeError))
+            expect(lambda: shredgen._validate_start('9', 'counter', 'uniform', 2)).to(
+                raise_error(shredgen.ExitCodeError))
+
+        with it('throws an error when the start is negative'):
+            expect(lambda: shredgen._validate_start('-1', 'counter', 'uniform', None)).to(
+                raise_error(shredgen.ExitCodeError))
+
+        with it('throws an error when the start is not a number'):
+            expect(lambda: shredgen._validate_start('foo', 'counter', 'uniform', None)).to(
+                raise_error(shredgen.ExitCodeError))
+
+    with description(shredgen._validate_workers):
+        with it('does not throw an error when there is at least one worker'):
+            expect(lambda: shredgen._validate_workers('1')).not_to(raise_error)
+
+        with it('throws an error when there are no workers'):
+            expect(lambda: shredgen._validate_workers('0')).to(raise_error(shredgen.ExitCodeError))
+
+        with it('throws an error when the workers is not a number'):
+            expect(lambda: shredgen._validate_workers('foo')).to(raise_error(shredgen.ExitCodeError))
+
+    with description(shredgen._validate_parallel):
+        with it('does not throw an error when streaming a seekable riff'):
+            expect(lambda: shredgen._validate_parallel(True, 'counter', 'weighted', None)).not_to(raise_error)
+
+        with it('throws an error when not streaming'):
+            expect(lambda: shredgen._validate_parallel(False, 'counter', 'uniform', None)).to(
+                raise_error(shredgen.ExitCodeError))
+
+        with it('throws an error when the riff is not seekable'):
+            expect(lambda: shredgen._validate_parallel(True, 'sequential', 'uniform', None)).to(
+                raise_error(shredgen.ExitCodeError))
+
+    with description(shredgen._validate_rank):
+        with it('does not throw an error when the rank is of a riff'):
+            expect(lambda: shredgen._validate_rank('0', 3, 2, 9)).not_to(raise_error)
+            expect(lambda: shredgen._validate_rank(' 8 ', 3, 2, 9)).not_to(raise_error)
+            expect(lambda: shredgen._validate_rank(8, 3, 2, 9)).not_to(raise_error)
+
+        with it('throws an error when the rank is past the last riff'):
+            expect(lambda: shredgen._validate_rank('9', 3, 2, 9)).to(raise_error(shredgen.ExitCodeError))
+            expect(lambda: shredgen._validate_rank(9, 3, 2, 9)).to(raise_error(shredgen.ExitCodeError))
+
+        with it('throws an error when the rank is negative'):
+            expect(lambda: shredgen._validate_rank('-1', 3, 2, 9)).to(raise_error(shredgen.ExitCodeError))
+
+        with it('throws an error when the rank is not a number'):
+            expect(lambda: shredgen._validate_rank('foo', 3, 2, 9)).to(raise_error(shredgen.ExitCodeError))
+
+        with it('throws an error when the rank is a bool'):
+            expect(lambda: shredgen._validate_rank(True, 3, 2, 9)).to(raise_error(shredgen.InvalidOptionError))
+            expect(lambda: shredgen._validate_rank(False, 3, 2, 9)).to(raise_error(shredgen.InvalidOptionError))
+
+        with it('does not put the number of riffs in the error message'):
+            expect(lambda: shredgen._validate_rank(-1, 17, 4000, 17 ** 4000)).to(
+                raise_error(shredgen.InvalidOptionError, contain('below 17 ** 4000')))
+
+    with description(shredgen._unrank_indices):
+        with it('returns the base radix digits of the rank, most significant first'):
+            expect(bytes(shredgen._unrank_indices(5, 3, 3))).to(equal(b'\x00\x01\x02'))
+            expect(bytes(shredgen._unrank_indices(0, 3, 0))).to(equal(b''))
+
+        with it('returns the same digits as dividing by the radix once per digit when the rank is split'):
+            length = shredgen._UNRANK_SPLIT_LENGTH * 5 + 3
+            rank = random.Random(3).randrange(7 ** length)
+            indices = bytearray(length)
+            remaining_rank = rank
+
+            for i in range(length - 1, -1, -1):
+                remaining_rank, indices[i] = divmod(remaining_rank, 7)
+
+            expect(shredgen._unrank_indices(rank, 7, length)).to(equal(indices))
+
+    with description(shredgen._parse_rank):
+        with it('returns int ranks without converting them to strings'):
+            rank = 17 ** 4000 - 1
+            expect(shredgen._parse_rank(rank, 17, 4000, 17 ** 4000)).to(be(rank))
+
+        with it('parses string ranks'):
+            expect(shredgen._parse_rank(' 8 ', 3, 2, 9)).to(equal(8))
+
+    with description(shredgen._display_enumerated_riffs):
+        with it('prints the tab of each riff from the rank'):
+            opts = mock({'scale': 'A maj pen', 'tuning': 'A', 'length': '2', 'count': ' 2 ', 'rank': ' 18 '})
+            scale = shredgen.get_scale('A maj pen')
+            when(builtins).print(...)
+            shredgen._display_enumerated_riffs(opts)
+            verify(builtins).print(str(shredgen.ASCIITab(shredgen.Riff(scale, b'\x01\x01'))))
+            verify(builtins).print('\n' + str(shredgen.ASCIITab(shredgen.Riff(scale, b'\x01\x02'))))
+
+    with description(shredgen._validate_riff_index):
+        with it('does not throw an error when the riff is in the corpus'):
+            expect(lambda: shredgen._validate_riff_index('0', 3)).not_to(raise_error)
+            expect(lambda: shredgen._validate_riff_index('2', 3)).not_to(raise_error)
+
+        with it('throws an error when the riff is past the end of the corpus'):
+            expect(lambda: shredgen._validate_riff_index('3', 3)).to(raise_error(shredgen.ExitCodeError))
+
+        with it('throws an error when the riff is negative'):
+            expect(lambda: shredgen._validate_riff_index('-1', 3)).to(raise_error(shredgen.ExitCodeError))
+
+        with it('throws an error when the riff is not a number'):
+            expect(lambda: shredgen._validate_riff_index('foo', 3)).to(raise_error(shredgen.ExitCodeError))
+
+    with description(shredgen._shred_many_in_scale):
+        with it('prints the tab of each riff'):
+            notes = [shredgen.Note('e', 1), shredgen.Note('B', 2)]
+            scale = mock({'notes': notes}, spec=shredgen.Scale)
+
+            when(shredgen)._render_riffs(scale, 1, 2, shredgen.RiffOptions(seed=42), None).thenReturn([
+                str(shredgen.ASCIITab([notes[0]])),
+                str(shredgen.ASCIITab([notes[1]]))
+            ])
+            when(builtins).print(...)
+
+            shredgen._shred_many_in_scale(scale, 1, 2, shredgen.RiffOptions(seed=42))
+
+            verify(builtins).print(
+                'e|-1-\nB|---\nG|---\nD|---\nA|---\nE|---\n\n'
+                'e|---\nB|-2-\nG|---\nD|---\nA|---\nE|---'
+            )
+
+    with description(shredgen._render_riffs):
+        with it('returns the tabs of the riffs that _generate_riffs() generates'):
+            scale = next(shredgen._get_all_scales())
+            options = shredgen.RiffOptions(seed=42, model='markov')
+            riffs = shredgen._generate_riffs(scale, 20, 3, options, max_workers=2)
+            expect(shredgen._render_riffs(scale, 20, 3, options, max_workers=2)).to(
+                equal([str(shredgen.ASCIITab(riff)) for riff in riffs]))
+
+    with description(shredgen._generate_riffs):
+        with before.each:
+            self.scale = next(shredgen._get_all_scales())
+
+        with it('returns the given number of riffs of the given length in the given scale'):
+            riffs = shredgen._generate_riffs(self.scale, 5, 3, shredgen.RiffOptions(seed=42), max_workers=2)
+            expect(len(riffs)).to(equal(3))
+
+            for riff in riffs:
+                expect(riff.scale).to(be(self.scale))
+                expect(len(riff)).to(equal(5))
+
+        with it('returns the same riffs for the same seed regardless of the number of workers'):
+            riffs_1 = shredgen._generate_riffs(self.scale, 20, 6, shredgen.RiffOptions(seed=42), max_workers=1)
+            riffs_2 = shredgen._generate_riffs(self.scale, 20, 6, shredgen.RiffOptions(seed=42), max_workers=3)
+            expect([r.indices for r in riffs_1]).to(equal([r.indices for r in riffs_2]))
+
+        with it('generates each riff from its own seed drawn from the given seed'):
+            seed_rng = random.Random(42)
+            expected = [shredgen._generate_riff(self.scale, 20, random.Random(seed_rng.getrandbits(64))).indices
+                        for _ in range(2)]
+            riffs = shredgen._generate_riffs(self.scale, 20, 2, shredgen.RiffOptions(seed=42), max_workers=2)
+            expect([r.indices for r in riffs]).to(
+                equal(expected)
+            )
+
     with description(shredgen._shred_in_scale):
+        with before.each:
+            self.rng = mock(random.Random)
+
+
         with it('generates a random array of notes from the given scale of the given length'):
             note_a = mock(shredgen.Note)
             note_b = mock(shredgen.Note)
@@ -355,10 +1437,10 @@ with description(shredgen) as self:
             scale = mock({'notes': [note_a, note_b, note_c]}, spec=shredgen.Scale)
 
             when(builtins).print(...)
-            when(random).randrange(...).thenReturn(2, 1, 0, 1, 2)
-            shredgen._shred_in_scale(scale, 5)
+            when(self.rng).random().thenReturn(0.7, 0.4, 0.0, 0.4, 0.99)
+            shredgen._shred_in_scale(scale, 5, rng=self.rng)
 
-            verify(builtins).print(arg_that(lambda arg: arg.notes == [
+            verify(builtins).print(arg_that(lambda arg: list(arg.notes) == [
                 note_c,
                 note_b,
                 note_a,
@@ -366,88 +1448,283 @@ with description(shredgen) as self:
                 note_c
             ]))
 
-    with description(shredgen._get_scale_by_name):
-        with before.each:
-            self.scale_a = mock({'aliases': ['a', 'aa', 'aaa']}, spec=shredgen.Scale)
-            self.scale_b = mock({'aliases': ['b', 'bb', 'bbb']}, spec=shredgen.Scale)
-            self.scale_c = mock({'aliases': ['c', 'cc', 'ccc']}, spec=shredgen.Scale)
+        with it('stores the notes as indices into the scale'):
+            scale = mock({'notes': [mock(shredgen.Note), mock(shredgen.Note)]}, spec=shredgen.Scale)
+
+            when(builtins).print(...)
+            when(self.rng).random().thenReturn(0.5, 0.0, 0.5)
+            shredgen._shred_in_scale(scale, 3, rng=self.rng)
 
-            when(shredgen)._get_all_scales().thenReturn([self.scale_a, self.scale_b, self.scale_c])
+            verify(builtins).print(arg_that(lambda arg: arg.notes.indices == b'\x01\x00\x01'))
 
-        with it('returns the first scale whose aliases contains the given name'):
-            expect(shredgen._get_scale_by_name('bb')).to(equal(self.scale_b))
+        with it('prints a tab for each chunk when given a chunk size'):
+            notes = [shredgen.Note('e', 1), shredgen.Note('B', 2)]
+            scale = mock({'notes': notes}, spec=shredgen.Scale)
 
-        with it('can find scales regarless of the case of the given name'):
-            expect(shredgen._get_scale_by_name('bBb')).to(equal(self.scale_b))
-            expect(shredgen._get_scale_by_name('C')).to(equal(self.scale_c))
+            when(builtins).print(...)
+            when(self.rng).random().thenReturn(0.0, 0.5, 0.5)
+            shredgen._shred_in_scale(scale, 3, 2, self.rng)
 
-        with it('returns None when none of the scales have an alias that matches the give scale'):
-            expect(shredgen._get_scale_by_name('x')).to(be_none)
+            verify(builtins).print(
+                'e|-1----\n'
+                'B|----2-\n'
+                'G|------\n'
+                'D|------\n'
+                'A|------\n'
+                'E|------',
+                flush=True
+            )
+            verify(builtins).print(
+                '\ne|---\n'
+                'B|-2-\n'
+                'G|---\n'
+                'D|---\n'
+                'A|---\n'
+                'E|---',
+                flush=True
+            )
 
-    with description(shredgen._get_tuned_scale):
+    with description(shredgen._generate_riff):
         with before.each:
-            self.scales = [mock(shredgen.Scale) for _ in range(0, 11)]
-            when(shredgen)._get_key_offset(...).thenReturn(3)
-            when(shredgen)._get_all_scales_of_type(...).thenReturn(self.scales)
+            self.scale = next(shredgen._get_all_scales())
+
+        with it('returns the same riff when given random number generators with the same seed'):
+            riff_1 = shredgen._generate_riff(self.scale, 100, random.Random(3))
+            riff_2 = shredgen._generate_riff(self.scale, 100, random.Random(3))
+            expect(riff_1.indices).to(equal(riff_2.indices))
+
+        with it('returns a riff of the given length made of indices into the scale'):
+            riff = shredgen._generate_riff(self.scale, 1000, random.Random(3))
+            expect(len(riff)).to(equal(1000))
+            expect(max(riff.indices) < len(self.scale.notes)).to(equal(True))
+
+        with it('returns the same riff for a seed with each model'):
+            for model in ['weighted', 'markov']:
+                riff_1 = shredgen._generate_riff(self.scale, 100, random.Random(3), shredgen.RiffOptions(model=model))
+                riff_2 = shredgen._generate_riff(self.scale, 100, random.Random(3), shredgen.RiffOptions(model=model))
+                expect(riff_1.indices).to(equal(riff_2.indices))
+                expect(max(riff_1.indices) < len(self.scale.notes)).to(equal(True))
+
+        with it('returns the notes from any start of a riff generated with a counter random number generator'):
+            for model in ['uniform', 'weighted']:
+                options = shredgen.RiffOptions(model=model)
+                riff = shredgen._generate_riff(self.scale, 100, shredgen.CounterRandom(3), options)
+                window = shredgen._generate_riff(self.scale, 20, shredgen.CounterRandom(3, 70), options)
+                expect(window.indices).to(equal(riff.indices[70:90]))
+
+    with description(shredgen._draw_indices):
+        with it('fills the indices with slices of at most the draw slice size'):
+            counts = []
+
+            def draw_slice(count):
+                counts.append(count)
+                return [len(counts)] * count
+
+            size = shredgen._DRAW_SLICE_SIZE
+            indices = shredgen._draw_indices(size * 2 + 3, draw_slice)
+
+            expect(counts).to(equal([size, size, 3]))
+            expect(bytes(indices)).to(equal(b'\x01' * size + b'\x02' * size + b'\x03' * 3))
+
+        with it('returns no indices for a length of zero'):
+            expect(shredgen._draw_indices(0, lambda count: [0] * count)).to(equal(bytearray()))
+
+    with description(shredgen._get_note_model):
+        with it('returns None for the uniform model'):
+            expect(shredgen._get_note_model(shredgen.get_scale('A maj pen'), 'uniform')).to(be_none)
+
+        with it('returns the same model each time it is used with a scale'):
+            scale = shredgen.get_scale('A maj pen')
+            model = shredgen._get_note_model(scale, 'markov')
+            expect(model).to(be_a(shredgen.MarkovNoteModel))
+            expect(shredgen._get_note_model(scale, 'markov')).to(be(model))
+            expect(shredgen._get_note_model(scale, 'weighted')).to(be_a(shredgen.WeightedNoteModel))
+
+        with it('returns a markov model for any model with a max fret jump'):
+            scale = shredgen.get_scale('A maj pen')
+
+            for model in ['uniform', 'weighted', 'markov']:
+                expect(shredgen._get_note_model(scale, model, 1)).to(be_a(shredgen.MarkovNoteModel))
+
+        with it('uses the model with no max fret jump for max fret jumps of at least the scale\'s span of frets'):
+            scale = shredgen.get_scale('A maj pen')
+
+            expect(shredgen._get_note_model(scale, 'uniform', 3)).to(be_none)
+            expect(shredgen._get_note_model(scale, 'markov', 10 ** 9)).to(be(shredgen._get_note_model(scale, 'markov')))
+            expect(shredgen._get_note_model(scale, 'markov', 2)).not_to(be(shredgen._get_note_model(scale, 'markov')))
+
+        with it('only keeps the most recently used models'):
+            scale = shredgen.get_scale('A maj pen')
+            orig_max_cached_note_models = shredgen._MAX_CACHED_NOTE_MODELS
+            shredgen._MAX_CACHED_NOTE_MODELS = 2
+
+            try:
+                model = shredgen._get_note_model(scale, 'markov', 1)
+                shredgen._get_note_model(scale, 'markov', 2)
+                shredgen._get_note_model(scale, 'weighted', 2)
+
+                expect(len(shredgen._note_models)).to(equal(2))
+                expect(shredgen._get_note_model(scale, 'markov', 1)).not_to(be(model))
+            finally:
+                shredgen._MAX_CACHED_NOTE_MODELS = orig_max_cached_note_models
+
+    with description(shredgen._get_next_note_weights):
+        with before.each:
+            self.scale = shredgen.Scale('Test', 'x', [], [
+                shredgen.Note('E', 5), shredgen.Note('A', 7), shredgen.Note('D', 8), shredgen.Note('D', 9)])
+
+        with it('gives no weight to notes more than the max fret jump from the note before'):
+            weights = shredgen._get_next_note_weights(self.scale, [1.0] * 4, 0, 'uniform', 2)
+            expect(weights).to(equal([1.0, 1.0, 0.0, 0.0]))
+
+        with it('keeps the weights when there is no max fret jump'):
+            weights = shredgen._get_next_note_weights(self.scale, [1.0, 2.0, 3.0, 4.0], 0, 'weighted')
+            expect(weights).to(equal([1.0, 2.0, 3.0, 4.0]))
+
+        with it('favors small steps from the note before with the markov model'):
+            weights = shredgen._get_next_note_weights(self.scale, [1.0] * 4, 2, 'markov')
+            expect(weights[3]).to(be_above(weights[1]))
+            expect(weights[2]).to(equal(shredgen._REPEATED_NOTE_WEIGHT))
+
+    with description(shredgen._get_note_weights):
+        with it('favors the root notes of the scale'):
+            scale = shredgen.Scale('Test', 'A', [], [
+                shredgen.Note('E', 5), shredgen.Note('E', 7), shredgen.Note('A', 0)])
+            expect(shredgen._get_note_weights(scale)).to(
+                equal([shredgen._ROOT_NOTE_WEIGHT, 1.0, shredgen._ROOT_NOTE_WEIGHT]))
+
+        with it('favors no notes when the scale has no known key'):
+            scale = shredgen.Scale('Test', 'x', [], [shredgen.Note('E', 5)])
+            expect(shredgen._get_note_weights(scale)).to(equal([1.0]))
+
+    with description(shredgen._shred_in_scale_in_parallel):
+        with it('prints the same tabs as streaming with one process'):
+            scale = shredgen.get_scale('A maj pen')
+            outputs = []
+            when(builtins).print(...).thenAnswer(lambda output, **kwargs: outputs.append(str(output)))
+
+            for model in ['uniform', 'weighted']:
+                del outputs[:]
+                options = shredgen.RiffOptions(seed=42, model=model, rng='counter', start=5)
+                shredgen._shred_in_scale(scale, 95, 10, shredgen.CounterRandom(42, 5), options)
+                expected = list(outputs)
+
+                del outputs[:]
+                shredgen._shred_in_scale_in_parallel(scale, 95, 10, options, 2)
+                expect(outputs).to(equal(expected))
+
+    with description(shredgen._generate_riff_chunks):
+        with it('yields riffs of at most the chunk size that add up to the given length'):
+            scale = mock({'notes': [mock(shredgen.Note)]}, spec=shredgen.Scale)
+            expect([len(riff) for riff in shredgen._generate_riff_chunks(scale, 7, 3)]).to(equal([3, 3, 1]))
+
+        with it('generates each chunk lazily'):
+            scale = mock({'notes': [mock(shredgen.Note)]}, spec=shredgen.Scale)
+            chunks = shredgen._generate_riff_chunks(scale, 10 ** 12, 3)
+            expect(len(next(chunks))).to(equal(3))
+
+        with it('yields the same notes as generating the whole riff at once'):
+            scale = next(shredgen._get_all_scales())
+            chunks = shredgen._generate_riff_chunks(scale, 10, 4, random.Random(7))
+            expect(b''.join(riff.indices for riff in chunks)).to(
+                equal(shredgen._generate_riff(scale, 10, random.Random(7)).indices)
+            )
 
-        with it('returns the given scale when the key offset is zero'):
-            scale = mock(shredgen.Scale)
-            when(shredgen)._get_key_offset(...).thenReturn(0)
-            expect(shredgen._get_tuned_scale(scale, 'C')).to(equal(scale))
+        with it('continues each chunk from the note before it with the markov model'):
+            scale = next(shredgen._get_all_scales())
+            options = shredgen.RiffOptions(model='markov')
+            chunks = shredgen._generate_riff_chunks(scale, 10, 4, random.Random(7), options)
+            expect(b''.join(riff.indices for riff in chunks)).to(
+                equal(shredgen._generate_riff(scale, 10, random.Random(7), options).indices)
+            )
 
-        with it('returns the scale at the determined offset'):
-            when(shredgen)._get_key_offset(...).thenReturn(3)
-            expect(shredgen._get_tuned_scale(self.scales[1], 'C')).to(equal(self.scales[4]))
+        with it('keeps consecutive notes within the max fret jump across chunks'):
+            scale = next(shredgen._get_all_scales())
+
+            for model in ['uniform', 'weighted', 'markov']:
+                options = shredgen.RiffOptions(model=model, max_fret_jump=1)
+                chunks = shredgen._generate_riff_chunks(scale, 1000, 7, random.Random(7), options)
+                frets = [scale.notes[i].fret for riff in chunks for i in riff.indices]
+                expect(max(abs(fret - prev_fret) for prev_fret, fret in zip(frets, frets[1:]))).to(equal(1))
 
-        with it('returns the scale at the wrapped offset if the offset index is greater than the number of notes in an '
-                'octave'):
-            when(shredgen)._get_key_offset(...).thenReturn(len(self.scales) + 1)
-            expect(shredgen._get_tuned_scale(self.scales[1], 'C')).to(equal(self.scales[2]))
+    with description(shredgen._get_scale_by_name):
+        with it('returns the scale with the given name from the scale registry'):
+            registry = mock(shredgen.ScaleRegistry)
+            scale = mock(shredgen.Scale)
 
-        with it('throws an exit code error when the other scales of the same type do not contain the given scale'):
-            when(shredgen)._get_all_scales_of_type(...).thenReturn(self.scales)
-            expect(lambda: shredgen._get_tuned_scale(mock(shredgen.Scale), 'C')).to(raise_error(shredgen.ExitCodeError))
+            when(registry).get_scale_by_name('foo').thenReturn(scale)
+            when(shredgen)._get_scale_registry().thenReturn(registry)
 
-        with it('throws an exit code error when the other scales of the same type are None'):
-            when(shredgen)._get_all_scales_of_type(...).thenReturn(None)
-            expect(lambda: shredgen._get_tuned_scale(mock(shredgen.Scale), 'C')).to(raise_error(shredgen.ExitCodeError))
+            expect(shredgen._get_scale_by_name('foo')).to(be(scale))
 
-    with description(shredgen._get_all_scales_of_type):
+    with description(shredgen._get_tuned_scale):
         with before.each:
-            self.maj_pen_1 = mock(shredgen.MajorPentatonicScale)
-            self.maj_pen_2 = mock(shredgen.MajorPentatonicScale)
+            self.scale = mock(shredgen.Scale)
+            self.tuned_scale = mock(shredgen.Scale)
+            self.registry = mock(shredgen.ScaleRegistry)
 
-            when(shredgen)._get_major_pentatonic_scales().thenReturn([self.maj_pen_1, self.maj_pen_2])
+            when(shredgen)._get_key_offset(...).thenReturn(3)
+            when(shredgen)._get_scale_registry().thenReturn(self.registry)
+            when(self.registry).get_transposed_scale(self.scale, 3).thenReturn(self.tuned_scale)
 
-        with it('returns all major pentatonic scales when given a major oentatonic scale'):
-            expect(shredgen._get_all_scales_of_type(mock(shredgen.MajorPentatonicScale))).to(equal([
-                self.maj_pen_1,
-                self.maj_pen_2
-            ]))
+        with it('returns the given scale when the key offset is zero'):
+            when(shredgen)._get_key_offset(...).thenReturn(0)
+            expect(shredgen._get_tuned_scale(self.scale, 'C')).to(equal(self.scale))
 
-        with it('returns None when given a scale of an unsupported type'):
-            expect(shredgen._get_all_scales_of_type(mock(shredgen.Scale))).to(be_none)
+        with it('returns the scale transposed by the key offset'):
+            expect(shredgen._get_tuned_scale(self.scale, 'C')).to(equal(self.tuned_scale))
 
-        with it('returns None when given None'):
-            expect(shredgen._get_all_scales_of_type(None)).to(be_none)
+        with it('throws an exit code error when the scale cannot be transposed'):
+            when(self.registry).get_transposed_scale(self.scale, 3).thenReturn(None)
+            expect(lambda: shredgen._get_tuned_scale(self.scale, 'C')).to(raise_error(shredgen.ExitCodeError))
 
     with description(shredgen._get_all_scales):
+        with it('returns the scales from the scale registry'):
+            registry = mock(shredgen.ScaleRegistry)
+            scales = iter([mock(shredgen.MajorPentatonicScale), mock(shredgen.MajorPentatonicScale)])
+
+            when(registry).get_scales().thenReturn(scales)
+            when(shredgen)._get_scale_registry().thenReturn(registry)
+
+            expect(shredgen._get_all_scales()).to(be(scales))
+
+    with description(shredgen._get_scale_registry):
         with before.each:
-            self.maj_pen_1 = mock(shredgen.MajorPentatonicScale)
-            self.maj_pen_2 = mock(shredgen.MajorPentatonicScale)
+            self.orig_scale_registry = shredgen._scale_registry
+            shredgen._scale_registry = None
 
-            when(shredgen)._get_major_pentatonic_scales().thenReturn([self.maj_pen_1, self.maj_pen_2])
+        with after.each:
+            shredgen._scale_registry = self.orig_scale_registry
 
-        with it('returns the major pentatonic scales'):
-            expect(shredgen._get_all_scales()).to(equal([self.maj_pen_1, self.maj_pen_2]))
+        with it('returns a registry of every family of scales, starting with the major pentatonic scales'):
+            registry = shredgen._get_scale_registry()
+            expect(len(registry.families)).to(equal(len(shredgen._SCALE_FORMULAS) + 1))
+            expect(next(registry.get_scales()).name).to(equal('A Major Pentatonic'))
 
-    with description(shredgen._get_major_pentatonic_scales):
-        with it('returns a scale for each key'):
-            expect(len(shredgen._get_major_pentatonic_scales())).to(equal(12))
+        with it('caches every scale in the catalog'):
+            registry = shredgen._get_scale_registry()
+            scales = list(registry.get_scales())
+            expect([id(registry.get_scale(scale.family, i % 12)) for i, scale in enumerate(scales)]).to(
+                equal([id(scale) for scale in scales]))
 
+        with it('only builds the registry once'):
+            registry = shredgen._get_scale_registry()
+            when(shredgen)._get_scale_families().thenRaise(AssertionError('rebuilt the registry'))
+            expect(shredgen._get_scale_registry()).to(be(registry))
+
+    with description(shredgen._get_major_pentatonic_family):
         with it('returns a major pentatonic scale for each key'):
-            for scale in shredgen._get_major_pentatonic_scales():
-                expect(isinstance(scale, shredgen.MajorPentatonicScale))
+            family = shredgen._get_major_pentatonic_family()
+
+            for key_num in range(12):
+                scale = family.build_scale(key_num)
+                expect(scale).to(be_a(shredgen.MajorPentatonicScale))
+                expect(scale.key).to(equal(shredgen._KEYS[key_num][0]))
+
+        with it('moves the shape down an octave in the keys whose shape would start at or past the 12th fret'):
+            family = shredgen._get_major_pentatonic_family()
+            lowest_frets = [min(note.fret for note in family.build_scale(key_num).notes) for key_num in range(12)]
+            expect(lowest_frets).to(equal([5, 6, 7, 8, 9, 10, 11, 0, 1, 2, 3, 4]))
 
     with description(shredgen._get_key_offset):
         with it('returns key #2 number - key #1 number'):
@@ -460,6 +1737,15 @@ with description(shredgen) as self:
             when(shredgen)._get_key_num('bar').thenReturn(7)
             expect(shredgen._get_key_offset(tuning_key='bar')).to(equal(2))
 
+        with it('returns the offset between any spellings of two known keys'):
+            expect(shredgen._get_key_offset('C')).to(equal(3))
+            expect(shredgen._get_key_offset('a sharp', orig_key='Db')).to(equal(-3))
+            expect(shredgen._get_key_offset(' G Flat ', orig_key='g#')).to(equal(-2))
+
+        with it('throws an exception when either key is unknown'):
+            expect(lambda: shredgen._get_key_offset('foo')).to(raise_error(shredgen.ExitCodeError))
+            expect(lambda: shredgen._get_key_offset('C', orig_key='foo')).to(raise_error(shredgen.ExitCodeError))
+
     with description(shredgen._get_key_num):
         with before.each:
             self.keys = dict([
@@ -486,6 +1772,10 @@ with description(shredgen) as self:
                 expect(shredgen._get_key_num(key_name.upper())).to(equal(num))
                 expect(shredgen._get_key_num(key_name.lower())).to(equal(num))
 
+        with it('can find the key number regardless of the whitespace in the given key'):
+            expect(shredgen._get_key_num(' B\tflat ')).to(equal(1))
+            expect(shredgen._get_key_num('GSharp')).to(equal(11))
+
         with it('throws an exception when the given key is unknown'):
             expect(lambda: shredgen._get_key_num('foo')).to(raise_error(shredgen.ExitCodeError))
 
@@ -495,6 +1785,77 @@ with description(shredgen) as self:
         with it('throws an exception when then given key is None'):
             expect(lambda: shredgen._get_key_num(None)).to(raise_error(shredgen.ExitCodeError))
 
+        with it('suggests the closest key when the given key is unknown'):
+            expect(lambda: shredgen._get_key_num('C shrp')).to(
+                raise_error(shredgen.InvalidKeyError, contain('Did you mean: C Sharp?')))
+
+    with description(shredgen._get_edit_distance):
+        with it('returns the fewest insertions, deletions, and substitutions between the strings'):
+            expect(shredgen._get_edit_distance('kitten', 'sitting')).to(equal(3))
+            expect(shredgen._get_edit_distance('flaw', 'lawn')).to(equal(2))
+            expect(shredgen._get_edit_distance('', 'abc')).to(equal(3))
+            expect(shredgen._get_edit_distance('abc', 'abc')).to(equal(0))
+
+        with it('returns one more than the max distance when the strings are further apart'):
+            expect(shredgen._get_edit_distance('kitten', 'sitting', 1)).to(equal(2))
+            expect(shredgen._get_edit_distance('a', 'abcdef', 2)).to(equal(3))
+
+        with it('returns the distance when it is within the max distance'):
+            expect(shredgen._get_edit_distance('kitten', 'sitting', 3)).to(equal(3))
+
+        with it('returns the distance between strings longer than a machine word'):
+            expect(shredgen._get_edit_distance('ab' * 50 + 'x' + 'ab' * 50, 'ab' * 50 + 'y' + 'ab' * 50)).to(equal(1))
+            expect(shredgen._get_edit_distance('a' * 100, 'b' * 70)).to(equal(100))
+
+    with description(shredgen._strip_common_affixes):
+        with it('returns the strings without the characters that they both start or end with'):
+            expect(shredgen._strip_common_affixes('kitten', 'sitting')).to(equal(('kitten', 'sitting')))
+            expect(shredgen._strip_common_affixes('abxcd', 'abcd')).to(equal(('x', '')))
+            expect(shredgen._strip_common_affixes('aaa', 'aa')).to(equal(('a', '')))
+
+    with description(shredgen._get_char_bits):
+        with it('returns the bits of the positions of each character in the string'):
+            expect(shredgen._get_char_bits('abca')).to(equal({'a': 0b1001, 'b': 0b10, 'c': 0b100}))
+
+    with description(shredgen._get_deletions):
+        with it('returns the strings left by deleting up to the given number of characters'):
+            expect(shredgen._get_deletions('abc', 1)).to(equal({'abc', 'bc', 'ac', 'ab'}))
+            expect(shredgen._get_deletions('abc', 2)).to(equal({'abc', 'bc', 'ac', 'ab', 'a', 'b', 'c'}))
+
+        with it('returns only the string when no deletions are allowed'):
+            expect(shredgen._get_deletions('abc', 0)).to(equal({'abc'}))
+
+    with description(shredgen._print_err_and_usage):
+        with before.each:
+            when(shredgen)._basename().thenReturn('shredgen')
+            when(builtins).print(...)
+
+        with it('prints the error and how to see the usage'):
+            shredgen._print_err_and_usage(shredgen.InvalidKeyError('Invalid key: H', shredgen._ERR_INVALID_KEY))
+            verify(builtins).print('Invalid key: H\nFor usage, execute: shredgen -h', file=sys.stderr)
+
+        with it('prints how to see the supported scales when the scale is unknown'):
+            shredgen._print_err_and_usage(shredgen.UnknownScaleError('Unknown scale: x', shredgen._ERR_UNKNOWN_SCALE))
+            verify(builtins).print(
+                'Unknown scale: x\n'
+                'To see all supported scale names, execute: shredgen --all-scale-names\n'
+                'To see all supported scales, execute: shredgen --all-scales\n'
+                'For usage, execute: shredgen -h', file=sys.stderr)
+
+    with description(shredgen._format_suggestions):
+        with it('asks whether any of the suggestions were meant'):
+            expect(shredgen._format_suggestions(['a', 'b'])).to(equal('\nDid you mean: a, b?'))
+
+        with it('returns an empty string when there are no suggestions'):
+            expect(shredgen._format_suggestions([])).to(equal(''))
+
+    with description(shredgen._normalize_name):
+        with it('lower cases the name and removes all whitespace'):
+            expect(shredgen._normalize_name(' \tA Sharp\nMaj  Pen ')).to(equal('asharpmajpen'))
+
+        with it('returns an empty string when given an empty name'):
+            expect(shredgen._normalize_name('')).to(equal(''))
+
     with description(shredgen._basename):
         with before.each:
             when(os.path).basename(...).thenReturn('basename')
@@ -544,6 +1905,23 @@ with description(shredgen) as self:
             ))
 
     with description(shredgen.Note):
+        with description(shredgen.Note.__new__):
+            with it('returns the same instance for notes that have the same values'):
+                expect(shredgen.Note('A', 1)).to(be(shredgen.Note('A', 1)))
+
+            with it('returns the same instance when unpickled'):
+                expect(pickle.loads(pickle.dumps(shredgen.Note('A', 1)))).to(be(shredgen.Note('A', 1)))
+
+        with description(shredgen.Note.__setattr__):
+            with it('does not allow the note to be modified'):
+                expect(lambda: setattr(shredgen.Note('A', 1), 'fret', 2)).to(raise_error(AttributeError))
+                expect(shredgen.Note('A', 1).fret).to(equal(1))
+
+        with description(shredgen.Note.__delattr__):
+            with it('does not allow the note to be modified'):
+                expect(lambda: delattr(shredgen.Note('A', 1), 'fret')).to(raise_error(AttributeError))
+                expect(shredgen.Note('A', 1).fret).to(equal(1))
+
         with description(shredgen.Note.__eq__):
             def note(_self, string='A', fret=1):
                 return shredgen.Note(string, fret)
@@ -606,64 +1984,433 @@ with description(shredgen) as self:
                 expect(str(scale)).to(equal('Test Scale {A1, B2, C3}'))
 
     with description(shredgen.MajorPentatonicScale):
-        with description(shredgen.MajorPentatonicScale.__eq__):
-            def mps(_self, key='Test', notes=None):
-                if notes is None:
-                    notes = [shredgen.Note('A', 1), shredgen.Note('B', 2), shredgen.Note('C', 3)]
+        with description(shredgen.MajorPentatonicScale._get_aliases_for_key):
+            with it('returns the aliases'):
+                expect(shredgen.MajorPentatonicScale._get_aliases_for_key('x')).to(equal([
+                    'x Major Pentatonic',
+                    'xMajorPentatonic',
+                    'x Maj Pen',
+                    'xMajPen',
+                ]))
 
-                return shredgen.MajorPentatonicScale(key, notes)
+    with description(shredgen.Riff):
+        with before.each:
+            self.notes = [shredgen.Note('A', 1), shredgen.Note('B', 2), shredgen.Note('C', 3)]
+            self.scale = shredgen.Scale('Test Scale', 'A', [], self.notes)
+            self.riff = shredgen.Riff(self.scale, bytearray([2, 0, 1, 2]))
 
+        with it('contains the notes of the scale at each index'):
+            expect(list(self.riff)).to(equal([self.notes[2], self.notes[0], self.notes[1], self.notes[2]]))
 
-            with it('returns true when given two scales that have the same name and notes'):
-                expect(self.mps()).to(equal(self.mps()))
+        with it('has one note per index'):
+            expect(len(self.riff)).to(equal(4))
 
-            with it('returns false when given two scales with different keys'):
-                expect(self.mps()).not_to(equal(self.mps(key='x')))
+        with it('returns the note at the given position'):
+            expect(self.riff[1]).to(be(self.notes[0]))
 
-            with it('returns false when given two scales with different notes'):
-                notes = [
-                    shredgen.Note('a', 1),
-                    shredgen.Note('b', 2),
-                    shredgen.Note('c', 3)
-                ]
-                expect(self.mps()).not_to(equal(self.mps(notes=notes)))
+        with it('returns a riff in the same scale when sliced'):
+            riff = self.riff[1:3]
+            expect(riff.scale).to(be(self.scale))
+            expect(list(riff)).to(equal([self.notes[0], self.notes[1]]))
 
-            with it('returns true when given two scales with the same notes in different orders notes'):
-                notes = [
-                    shredgen.Note('C', 3),
-                    shredgen.Note('A', 1),
-                    shredgen.Note('B', 2)
-                ]
-                expect(self.mps()).to(equal(self.mps(notes=notes)))
+        with it('throws an error when the scale has too many notes to be indexed by a byte'):
+            scale = shredgen.Scale('Big Scale', 'A', [], [shredgen.Note('A', i) for i in range(257)])
+            expect(lambda: shredgen.Riff(scale, b'')).to(raise_error(ValueError))
 
-        with description(shredgen.MajorPentatonicScale.from_other):
-            with it('returns a new scale with each note from the given scale at the given offset'):
-                note_a = shredgen.Note('a', 1)
-                note_b = shredgen.Note('b', 1)
-                note_c = shredgen.Note('c', 1)
+    with description(shredgen.RiffCorpus):
+        with before.each:
+            self.temp_dir = tempfile.TemporaryDirectory()
+            self.path = os.path.join(self.temp_dir.name, 'riffs.shrc')
+            self.scale = shredgen.get_scale('D Maj Pen')
+            self.riffs = [shredgen.Riff(self.scale, bytearray([1, 2, 3])), shredgen.Riff(self.scale, bytearray()),
+                          shredgen.Riff(self.scale, bytearray([16, 0]))]
+            shredgen.write_corpus(self.path, self.riffs)
 
-                note_a_off = shredgen.Note('a', 2)
-                note_b_off = shredgen.Note('b', 2)
-                note_c_off = shredgen.Note('c', 2)
+        with after.each:
+            self.temp_dir.cleanup()
 
-                when(note_a).offset(3, True).thenReturn(note_a_off)
-                when(note_b).offset(3, True).thenReturn(note_b_off)
-                when(note_c).offset(3, True).thenReturn(note_c_off)
+        def truncate(self, size):
+            with open(self.path, 'r+b') as f:
+                f.truncate(size)
 
-                scale_1 = shredgen.MajorPentatonicScale('a', [note_a, note_b, note_c])
-                scale_2 = shredgen.MajorPentatonicScale.from_other(scale_1, 3, 'b')
+        def overwrite(self, offset, data):
+            with open(self.path, 'r+b') as f:
+                f.seek(offset)
+                f.write(data)
 
-                expect(scale_2.key).to(equal('b'))
-                expect(scale_2.notes).to(equal([note_a_off, note_b_off, note_c_off]))
+        def offset_of_riff(self, index):
+            return struct.calcsize(shredgen._CORPUS_HEADER_FORMAT) + len(self.scale.name) + 8 * index
 
-        with description(shredgen.MajorPentatonicScale._get_aliases_for_key):
-            with it('returns the aliases'):
-                expect(shredgen.MajorPentatonicScale._get_aliases_for_key('x')).to(equal([
-                    'x Major Pentatonic',
-                    'xMajorPentatonic',
-                    'x Maj Pen',
-                    'xMajPen',
+        with it('reads back each riff that was written, in the same scale'):
+            with shredgen.RiffCorpus(self.path) as corpus:
+                expect(len(corpus)).to(equal(3))
+                expect(corpus.scale).to(be(self.scale))
+
+                for i, riff in enumerate(self.riffs):
+                    expect(bytes(corpus[i].indices)).to(equal(bytes(riff.indices)))
+
+        with it('reads riffs by negative index'):
+            with shredgen.RiffCorpus(self.path) as corpus:
+                expect(bytes(corpus[-1].indices)).to(equal(b'\x10\x00'))
+
+        with it('throws an IndexError when the index is out of range'):
+            with shredgen.RiffCorpus(self.path) as corpus:
+                expect(lambda: corpus[3]).to(raise_error(IndexError))
+
+        with it('reads an empty corpus'):
+            shredgen.write_corpus(self.path, [])
+
+            with shredgen.RiffCorpus(self.path) as corpus:
+                expect(len(corpus)).to(equal(0))
+
+        with it('throws an InvalidCorpusError when the file does not exist'):
+            expect(lambda: shredgen.RiffCorpus(self.path + '.missing')).to(raise_error(shredgen.InvalidCorpusError))
+
+        with it('throws an InvalidCorpusError when the file is not a corpus'):
+            with open(self.path, 'wb') as f:
+                f.write(b'not a corpus file')
+
+            expect(lambda: shredgen.RiffCorpus(self.path)).to(raise_error(shredgen.InvalidCorpusError))
+
+        with it('throws an InvalidCorpusError when the file ends inside the offsets'):
+            self.truncate(40)
+            expect(lambda: shredgen.RiffCorpus(self.path)).to(raise_error(shredgen.InvalidCorpusError))
+
+        with it('throws an InvalidCorpusError when the file ends inside the notes'):
+            self.truncate(os.path.getsize(self.path) - 1)
+            expect(lambda: shredgen.RiffCorpus(self.path)).to(raise_error(shredgen.InvalidCorpusError))
+
+        with it('throws an InvalidCorpusError when a riff\'s offsets are out of order'):
+            self.overwrite(self.offset_of_riff(1), struct.pack('<Q', 2 ** 40))
+
+            with shredgen.RiffCorpus(self.path) as corpus:
+                expect(lambda: corpus[0]).to(raise_error(shredgen.InvalidCorpusError))
+                expect(lambda: corpus[1]).to(raise_error(shredgen.InvalidCorpusError))
+
+        with it('throws an InvalidCorpusError when a riff has notes that are not in the scale'):
+            self.overwrite(os.path.getsize(self.path) - 1, bytes([17]))
+
+            with shredgen.RiffCorpus(self.path) as corpus:
+                expect(lambda: corpus[2]).to(raise_error(shredgen.InvalidCorpusError))
+
+        with it('throws an InvalidCorpusError when the scale is unknown'):
+            scale = shredgen.Scale('Nope', 'A', [], [shredgen.Note('A', 1)])
+            shredgen.write_corpus(self.path, [shredgen.Riff(scale, b'')])
+            expect(lambda: shredgen.RiffCorpus(self.path)).to(raise_error(shredgen.InvalidCorpusError))
+
+        with it('refuses to write riffs in different scales to one corpus'):
+            riffs = [shredgen.Riff(self.scale, b''), shredgen.Riff(shredgen.get_scale('E Maj Pen'), b'')]
+            expect(lambda: shredgen.write_corpus(self.path, riffs)).to(raise_error(ValueError))
+
+    with description(shredgen.AliasTable):
+        with it('draws each index about as often as its weight'):
+            table = shredgen.AliasTable([1, 0, 3, 4])
+            rng = random.Random(1)
+            counts = [0] * len(table)
+
+            for _ in range(80000):
+                counts[table.draw(rng.random)] += 1
+
+            expect(counts[1]).to(equal(0))
+
+            for i, expected in [(0, 10000), (2, 30000), (3, 40000)]:
+                expect(abs(counts[i] - expected)).to(be_below(1000))
+
+        with it('draws the only index when there is one weight'):
+            expect(shredgen.AliasTable([5]).draw(lambda: 0.99)).to(equal(0))
+
+        with it('throws an error when no weight is positive'):
+            expect(lambda: shredgen.AliasTable([0, 0])).to(raise_error(ValueError))
+            expect(lambda: shredgen.AliasTable([])).to(raise_error(ValueError))
+
+    with description(shredgen.CounterRandom):
+        with it('returns the same numbers for the same seed'):
+            rng_1 = shredgen.CounterRandom(42)
+            rng_2 = shredgen.CounterRandom(42)
+            expect([rng_1.random() for _ in range(5)]).to(equal([rng_2.random() for _ in range(5)]))
+
+        with it('returns different numbers for different seeds'):
+            expect(shredgen.CounterRandom(1).random()).not_to(equal(shredgen.CounterRandom(2).random()))
+
+        with it('returns the number at the current index and then moves to the next index'):
+            rng = shredgen.CounterRandom(42, 10)
+            expected = rng.random_at(10)
+            expect(rng.random()).to(equal(expected))
+            expect(rng.index).to(equal(11))
+
+        with it('yields the same numbers in bulk as one at a time'):
+            rng = shredgen.CounterRandom(42, 3)
+            expect(list(rng.randoms(50))).to(equal([shredgen.CounterRandom(42).random_at(i) for i in range(3, 53)]))
+            expect(rng.index).to(equal(53))
+
+        with it('returns numbers from zero up to one'):
+            values = list(shredgen.CounterRandom(7).randoms(10000))
+            expect(min(values)).to(be_above_or_equal(0))
+            expect(max(values)).to(be_below(1))
+
+    with description(shredgen.MarkovNoteModel):
+        with before.each:
+            self.model = shredgen.MarkovNoteModel([1, 1, 1], [[0, 1, 3], [1, 0, 0], [1, 1, 1]])
+
+        with it('draws each note by the next weights of the note before'):
+            counts = [0] * 3
+
+            for _ in range(10000):
+                counts[self.model.generate(1, random.random, 0)[0]] += 1
+
+            expect(counts[0]).to(equal(0))
+            expect(counts[2]).to(be_above(counts[1]))
+
+        with it('never draws a note with no weight after the note before'):
+            indices = self.model.generate(1000, random.Random(2).random)
+            expect(b'\x01\x01' in indices or b'\x01\x02' in indices).to(be(False))
+
+        with it('returns the given number of indices into the scale'):
+            indices = self.model.generate(50, random.Random(2).random)
+            expect(indices).to(have_len(50))
+            expect(max(indices)).to(be_below(3))
+
+    with description(shredgen.ScaleFamily):
+        def one_note_family(_self, names, scale_class=None):
+            class OneNoteScaleFamily(shredgen.ScaleFamily):
+                def get_notes(self, key_num):
+                    return [shredgen.Note('A', key_num)]
+
+            return OneNoteScaleFamily(names, scale_class)
+
+
+        with it('cannot be created without a way to get the notes of its scales'):
+            expect(lambda: shredgen.ScaleFamily(['Foo Bar'])).to(raise_error(TypeError))
+
+        with description(shredgen.ScaleFamily.get_aliases):
+            with it('returns each name of the family in the given key, with & without spaces'):
+                family = self.one_note_family(['Foo Bar', 'Baz'])
+                expect(family.get_aliases('x')).to(equal(['x Foo Bar', 'xFooBar', 'x Baz', 'xBaz']))
+
+        with description(shredgen.ScaleFamily.build_scale):
+            with before.each:
+                self.family = self.one_note_family(['Foo Bar', 'Baz'])
+
+            with it('returns a scale of the family in the key with the given number'):
+                scale = self.family.build_scale(1)
+
+                expect(scale.name).to(equal('A# Foo Bar'))
+                expect(scale.key).to(equal('A#'))
+                expect(scale.aliases).to(equal(('A# Foo Bar', 'A#FooBar', 'A# Baz', 'A#Baz')))
+                expect(scale.notes).to(equal((shredgen.Note('A', 1),)))
+                expect(scale.family).to(be(self.family))
+
+            with it('returns a scale of the family\'s scale class when it has one'):
+                family = self.one_note_family(['Major Pentatonic'], shredgen.MajorPentatonicScale)
+                scale = family.build_scale(1)
+
+                expect(scale).to(be_a(shredgen.MajorPentatonicScale))
+                expect(scale.name).to(equal('A# Major Pentatonic'))
+                expect(scale.family).to(be(family))
+
+    with description(shredgen.ShapeScaleFamily):
+        with before.each:
+            self.family = shredgen.ShapeScaleFamily(['Test'], [shredgen.Note('E', 5), shredgen.Note('A', 7)])
+
+        with it('returns the shape in the key of A'):
+            expect(self.family.get_notes(0)).to(equal([shredgen.Note('E', 5), shredgen.Note('A', 7)]))
+
+        with it('slides the shape up the neck by the key number'):
+            expect(self.family.get_notes(6)).to(equal([shredgen.Note('E', 11), shredgen.Note('A', 13)]))
+
+        with it('plays the shape an octave lower when it would start at the 12th fret or higher'):
+            expect(self.family.get_notes(7)).to(equal([shredgen.Note('E', 0), shredgen.Note('A', 2)]))
+
+    with description(shredgen.FormulaScaleFamily):
+        with it('returns the notes of the formula in the position around the root on the low E string'):
+            family = shredgen.FormulaScaleFamily(['Minor Pentatonic'], [0, 3, 5, 7, 10])
+            expect([str(note) for note in family.get_notes(0)]).to(equal([
+                'E5', 'E8', 'A5', 'A7', 'D5', 'D7', 'G5', 'G7', 'B5', 'B8', 'e5', 'e8'
+            ]))
+
+        with it('includes the fret below the root'):
+            family = shredgen.FormulaScaleFamily(['Ionian'], [0, 2, 4, 5, 7, 9, 11])
+            expect(family.get_notes(0)[0]).to(equal(shredgen.Note('E', 4)))
+
+        with it('starts the position at the nut when the root is the open low E string'):
+            family = shredgen.FormulaScaleFamily(['Ionian'], [0, 2, 4, 5, 7, 9, 11])
+            expect([note.fret for note in family.get_notes(7) if note.string == 'E']).to(equal([0, 2, 4]))
+
+        with it('never repeats a pitch'):
+            for names, intervals in shredgen._SCALE_FORMULAS:
+                for key_num in range(12):
+                    notes = shredgen.FormulaScaleFamily(names, intervals).get_notes(key_num)
+                    pitches = [shredgen._get_pitch(note) for note in notes]
+                    expect(pitches).to(equal(sorted(set(pitches))))
+
+        with it('only returns notes in the scale, and every note of the scale'):
+            for names, intervals in shredgen._SCALE_FORMULAS:
+                for key_num in range(12):
+                    notes = shredgen.FormulaScaleFamily(names, intervals).get_notes(key_num)
+                    expect(set(shredgen._get_key_num_of_note(n) for n in notes)).to(
+                        equal(set((key_num + interval) % 12 for interval in intervals)))
+
+    with description(shredgen.ScaleRegistry):
+        with before.each:
+            self.maj_pen = shredgen.ShapeScaleFamily(
+                ['Major Pentatonic', 'Maj Pen'], [shredgen.Note('A', 1)], shredgen.MajorPentatonicScale)
+            self.blues = shredgen.FormulaScaleFamily(['Blues'], [0, 3, 5, 6, 7, 10])
+            self.registry = shredgen.ScaleRegistry([self.maj_pen, self.blues])
+
+        with description(shredgen.ScaleRegistry.get_scale):
+            with it('returns the family\'s scale in the key with the given number'):
+                scale = self.registry.get_scale(self.blues, 3)
+                expect(scale.name).to(equal('C Blues'))
+                expect(scale.family).to(be(self.blues))
+
+            with it('wraps key numbers past the last key'):
+                expect(self.registry.get_scale(self.blues, 15)).to(be(self.registry.get_scale(self.blues, 3)))
+
+            with it('only builds each scale once while it is cached'):
+                scale = self.registry.get_scale(self.blues, 3)
+                when(self.blues).build_scale(...).thenRaise(AssertionError('rebuilt the scale'))
+                expect(self.registry.get_scale(self.blues, 3)).to(be(scale))
+
+            with it('only keeps the most recently used scales'):
+                registry = shredgen.ScaleRegistry([self.blues], max_cached_scales=2)
+                scale_a = registry.get_scale(self.blues, 0)
+                scale_b = registry.get_scale(self.blues, 1)
+                registry.get_scale(self.blues, 0)
+                registry.get_scale(self.blues, 2)
+
+                expect(registry.get_scale(self.blues, 0)).to(be(scale_a))
+                expect(registry.get_scale(self.blues, 1)).not_to(be(scale_b))
+                expect(registry.get_scale(self.blues, 1).name).to(equal(scale_b.name))
+
+        with description(shredgen.ScaleRegistry.get_scales):
+            with it('yields the scale of every family in every key'):
+                names = [scale.name for scale in self.registry.get_scales()]
+                expect(len(names)).to(equal(24))
+                expect(names[:2]).to(equal(['A Major Pentatonic', 'A# Major Pentatonic']))
+                expect(names[12:14]).to(equal(['A Blues', 'A# Blues']))
+
+            with it('does not build any scale until it is needed'):
+                when(self.maj_pen).build_scale(...).thenRaise(AssertionError('built a scale'))
+                when(self.blues).build_scale(...).thenRaise(AssertionError('built a scale'))
+                self.registry.get_scales()
+
+        with description(shredgen.ScaleRegistry.get_names):
+            with it('returns every spelling of every alias of every scale'):
+                names = self.registry.get_names()
+
+                expect(names[:8]).to(equal([
+                    'A Major Pentatonic', 'AMajorPentatonic', 'A Maj Pen', 'AMajPen',
+                    'A# Major Pentatonic', 'A sharp Major Pentatonic', 'ASharp Major Pentatonic', 'Bb Major Pentatonic'
                 ]))
+                expect(names).to(contain('D Flat Blues', 'GFlatBlues', 'G Blues'))
+
+            with it('does not build any scales'):
+                when(self.maj_pen).build_scale(...).thenRaise(AssertionError('built a scale'))
+                when(self.blues).build_scale(...).thenRaise(AssertionError('built a scale'))
+                self.registry.get_names()
+
+        with description(shredgen.ScaleRegistry.get_transposed_scale):
+            with before.each:
+                self.scale = self.registry.get_scale(self.blues, 1)
+
+            with it('returns the scale of the same family at the given offset'):
+                expect(self.registry.get_transposed_scale(self.scale, 2)).to(be(self.registry.get_scale(self.blues, 3)))
+
+            with it('wraps offsets past the last key'):
+                expect(self.registry.get_transposed_scale(self.scale, 13).name).to(equal('B Blues'))
+
+            with it('wraps negative offsets'):
+                expect(self.registry.get_transposed_scale(self.scale, -2).name).to(equal('G# Blues'))
+
+            with it('returns None when the given scale\'s family is not in the registry'):
+                scale = shredgen.FormulaScaleFamily(['Blues'], [0, 3, 5, 6, 7, 10]).build_scale(1)
+                expect(self.registry.get_transposed_scale(scale, 1)).to(be_none)
+
+            with it('returns None when the given scale has no family'):
+                expect(self.registry.get_transposed_scale(shredgen.Scale('x', 'A', [], []), 1)).to(be_none)
+
+        with description(shredgen.ScaleRegistry.get_scale_by_name):
+            with it('returns the scale of the family with the name in the key that the name starts with'):
+                expect(self.registry.get_scale_by_name('C Blues')).to(be(self.registry.get_scale(self.blues, 3)))
+                expect(self.registry.get_scale_by_name('C Maj Pen')).to(be(self.registry.get_scale(self.maj_pen, 3)))
+
+            with it('returns the scale of the first family with the name'):
+                other_blues = shredgen.FormulaScaleFamily(['Blues'], [0])
+                registry = shredgen.ScaleRegistry([self.blues, other_blues])
+                expect(registry.get_scale_by_name('C Blues').family).to(be(self.blues))
+
+            with it('can find scales regarless of the case of the given name'):
+                expect(self.registry.get_scale_by_name('c bLUES').name).to(equal('C Blues'))
+
+            with it('can find scales regardless of the whitespace in the given name'):
+                expect(self.registry.get_scale_by_name(' A #\tblu es ').name).to(equal('A# Blues'))
+
+            with it('can find scales by any spelling of their key'):
+                expect(self.registry.get_scale_by_name('A Sharp Blues').name).to(equal('A# Blues'))
+                expect(self.registry.get_scale_by_name('bb blues').name).to(equal('A# Blues'))
+                expect(self.registry.get_scale_by_name('BFlat Maj Pen').name).to(equal('A# Major Pentatonic'))
+                expect(self.registry.get_scale_by_name('b blues').name).to(equal('B Blues'))
+
+            with it('returns None when no family has the name'):
+                expect(self.registry.get_scale_by_name('A Foo')).to(be_none)
+
+            with it('returns None when the name does not start with a key'):
+                expect(self.registry.get_scale_by_name('H Blues')).to(be_none)
+                expect(self.registry.get_scale_by_name('Blues')).to(be_none)
+                expect(self.registry.get_scale_by_name('')).to(be_none)
+
+    with description(shredgen.NameIndex):
+        with before.each:
+            self.index = shredgen.NameIndex(['Foo Bar', 'FooBar', 'Food', 'Fob', 'Baz', 'Bar'])
+
+        with description(shredgen.NameIndex.complete):
+            with it('returns the first spelling of each name that starts with the prefix, in normalized order'):
+                expect(self.index.complete('fo')).to(equal(['Fob', 'Foo Bar', 'Food']))
+
+            with it('ignores case and whitespace'):
+                expect(self.index.complete(' F O O b')).to(equal(['Foo Bar']))
+
+            with it('returns at most the given number of names'):
+                expect(self.index.complete('', 2)).to(equal(['Bar', 'Baz']))
+
+            with it('returns an empty list when no name starts with the prefix'):
+                expect(self.index.complete('x')).to(equal([]))
+
+        with description(shredgen.NameIndex.suggest):
+            with it('returns the closest names within a few edits'):
+                expect(self.index.suggest('Fooo')).to(equal(['Food']))
+                expect(self.index.suggest('Bax')).to(equal(['Bar', 'Baz']))
+
+            with it('returns an empty list when no name is close'):
+                expect(self.index.suggest('Quux')).to(equal([]))
+
+            with it('returns an empty list when there are no names'):
+                expect(shredgen.NameIndex([]).suggest('Foo')).to(equal([]))
+
+            with it('returns the same names once the suggestions are indexed'):
+                self.index.index_suggestions()
+
+                expect(self.index.suggest('Fooo')).to(equal(['Food']))
+                expect(self.index.suggest('Bax')).to(equal(['Bar', 'Baz']))
+                expect(self.index.suggest('Quux')).to(equal([]))
+
+            with it('finds the same names as comparing against every name, whether or not they are indexed'):
+                names = shredgen._get_scale_registry().get_names()
+                index = shredgen.NameIndex(names)
+                indexed = shredgen.NameIndex(names)
+                indexed.index_suggestions()
+
+                for name in ['cmajpan', 'asharpmaj', 'G# Major Pentatonik', 'Eb Maj', 'x']:
+                    normalized_name = shredgen._normalize_name(name)
+                    max_distance = min(shredgen._MAX_SUGGESTION_DISTANCE, len(normalized_name) // 3 + 1)
+                    distances = dict((shredgen._normalize_name(n), shredgen._get_edit_distance(
+                        normalized_name, shredgen._normalize_name(n))) for n in names)
+                    closest = min(distances.values())
+                    expected = sorted(n for n, d in distances.items() if d == closest and d <= max_distance)
+                    expect(sorted(shredgen._normalize_name(n) for n in index.suggest(name, len(names)))).to(
+                        equal(expected))
+                    expect(sorted(shredgen._normalize_name(n) for n in indexed.suggest(name, len(names)))).to(
+                        equal(expected))
 
     with description(shredgen.ASCIITab):
         with it('prints the notes in ASCII tab format'):
@@ -683,6 +2430,17 @@ with description(shredgen) as self:
                 'E|------------------0-'
             ))
 
+        with it('prints the notes of a riff in ASCII tab format'):
+            scale = shredgen.Scale('Test Scale', 'A', [], [shredgen.Note('G', 10), shredgen.Note('e', 3)])
+            expect(str(shredgen.ASCIITab(shredgen.Riff(scale, bytearray([1, 0, 1]))))).to(equal(
+                'e|-3------3-\n'
+                'B|----------\n'
+                'G|----10----\n'
+                'D|----------\n'
+                'A|----------\n'
+                'E|----------'
+            ))
+
         with it('prints an empty ASCII tab when the given no notes'):
             expect(str(shredgen.ASCIITab([]))).to(equal(
                 'e|--\n'
@@ -692,3 +2450,55 @@ with description(shredgen) as self:
                 'A|--\n'
                 'E|--'
             ))
+
+    with description(shredgen.Profiler):
+        with before.each:
+            self.profiler = shredgen.Profiler((time.perf_counter(), sys.getallocatedblocks()))
+
+        with it('records the time before it was created as the time spent parsing options'):
+            expect(self.profiler.phases['parse_opts']['calls']).to(equal(1))
+
+        with it('records the number of calls and time spent in each phase'):
+            for _ in range(3):
+                self.profiler.start('foo')
+                self.profiler.stop()
+
+            expect(self.profiler.phases['foo']['calls']).to(equal(3))
+            expect(self.profiler.phases['foo']['seconds']).to(be_above(0))
+
+        with it('records the change in the number of allocated blocks in each phase'):
+            gc.collect()  # so that no garbage left by other specs is freed during the phase
+            self.profiler.start('foo')
+            blocks = [[i] for i in range(1000)]
+            self.profiler.stop()
+
+            expect(self.profiler.phases['foo']['allocated_blocks']).to(be_above_or_equal(len(blocks)))
+
+        with it('only counts time spent in a nested phase toward the nested phase'):
+            self.profiler.start('outer')
+            self.profiler.start('inner')
+            time.sleep(0.05)
+            self.profiler.stop()
+            self.profiler.stop()
+
+            expect(self.profiler.phases['inner']['seconds']).to(be_above_or_equal(0.05))
+            expect(self.profiler.phases['outer']['seconds']).to(be_below(0.05))
+            expect(self.profiler.phases['outer']['calls']).to(equal(1))
+
+        with description(shredgen.Profiler.stop_all):
+            with it('stops every phase and returns the report'):
+                self.profiler.start('foo')
+                report = self.profiler.stop_all()
+
+                expect(report['phases']['foo']['calls']).to(equal(1))
+                expect(report['total_seconds']).to(be_above(0))
+
+        with description(shredgen.Profiler.dump_cprofile_stats):
+            with it('writes the cProfile stats'):
+                profiler = shredgen.Profiler((time.perf_counter(), 0), cprofile=True)
+                profiler.stop_all()
+
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    path = os.path.join(temp_dir, 'stats.prof')
+                    profiler.dump_cprofile_stats(path)
+                    expect(os.path.getsize(path)).to(be_above(0))